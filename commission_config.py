@@ -2,9 +2,20 @@
 Commission Configuration based on Thomas Bieth's commission plans
 """
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict, List, Optional
 from datetime import date
 
+@lru_cache(maxsize=512)
+def _quarter_of(year: int, month: int) -> str:
+    """Quarter string for a year/month, e.g. (2025, 4) -> 'Q2_2025'"""
+    return f"Q{(month - 1) // 3 + 1}_{year}"
+
+@lru_cache(maxsize=128)
+def _commission_rate(config_cls, year: int, deal_type: str, is_ps: bool) -> float:
+    """Rate lookup behind CommissionConfig.get_commission_rate, cached per argument combination"""
+    return config_cls._lookup_commission_rate(year, deal_type, is_ps)
+
 @dataclass
 class CommissionPlan:
     year: int
@@ -105,6 +116,12 @@ class CommissionConfig:
     @classmethod
     def get_commission_rate(cls, year: int, deal_type: str, is_ps: bool = False) -> float:
         """Get commission rate for a specific deal type and year"""
+        # Only a few years x deal types occur, so each combination is resolved once
+        return _commission_rate(cls, year, deal_type, is_ps)
+        
+    @classmethod
+    def _lookup_commission_rate(cls, year: int, deal_type: str, is_ps: bool) -> float:
+        """Resolve the commission rate from the plan of the year"""
         if is_ps:
             return cls.PLANS[year].ps_flat_rate
             
@@ -146,17 +163,7 @@ class CommissionConfig:
     @classmethod
     def get_quarter_from_date(cls, date_obj: date) -> str:
         """Get quarter string from date"""
-        month = date_obj.month
-        year = date_obj.year
-        
-        if month <= 3:
-            return f"Q1_{year}"
-        elif month <= 6:
-            return f"Q2_{year}"
-        elif month <= 9:
-            return f"Q3_{year}"
-        else:
-            return f"Q4_{year}"
+        return _quarter_of(date_obj.year, date_obj.month)
     
     @classmethod
     def calculate_split_quarters(cls, close_date: date, service_start_date: Optional[date] = None) -> Dict[str, float]:
@@ -4,31 +4,50 @@ Fix revenue start dates for CPI/FP increase deals.
 According to business rules:
 - CPI/FP increases are set twice per year
 - Revenue start should be January 1st of the following year
+
+Usage: fix_increase_revenue_dates.py [input_file] [output_file] [--diff-only]
+
+With --diff-only only the change log (including the 1-based data row of
+each corrected row) is written and the full corrected CSV is not rewritten.
 """
 import pandas as pd
 from datetime import datetime
+import re
 import sys
 
-def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all_salescookie_credits_fixed.csv'):
-    """Fix revenue start dates for CPI/FP increase deals"""
+# Deal names of CPI/FP increase deals
+CPI_FP_INCREASE_PATTERN = re.compile(r'cpi increase|fp increase|fixed price increase', re.IGNORECASE)
+
+def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all_salescookie_credits_fixed.csv',
+                      diff_only=False):
+    """Fix revenue start dates for CPI/FP increase deals
+    
+    If diff_only is set, the full fixed CSV is not written; the change log
+    records the 1-based data row of each corrected row instead (the header
+    and blank lines are not counted, a multi-line record counts once).
+    """
     
     print("Loading data...")
-    # Read the data
-    df = pd.read_csv(input_file, encoding='utf-8-sig')
+    # Read the data; the columns used here are kept as plain strings so their
+    # values are written back as read (other columns are still type-inferred)
+    df = pd.read_csv(input_file, encoding='utf-8-sig',
+                     dtype={'Deal Name': 'string', 'Close Date': 'string', 'Revenue Start Date': 'string'})
     
     # Create a copy for modifications
     df_fixed = df.copy()
     
     # Track changes
+    # Change log is collected column-wise and turned into a DataFrame once
     changes_made = 0
-    changes_log = []
+    changed_rows = []
+    deal_col, close_col, old_col, new_col, acv_col, commission_col = [], [], [], [], [], []
     
     # Process each row
     for idx, row in df_fixed.iterrows():
         deal_name = str(row.get('Deal Name', ''))
         
         # Check if this is a CPI/FP increase deal
-        if any(pattern in deal_name.lower() for pattern in ['cpi increase', 'fp increase', 'fixed price increase']):
+        if CPI_FP_INCREASE_PATTERN.search(deal_name):
             # Parse dates
             try:
                 close_date = pd.to_datetime(row['Close Date'])
@@ -42,17 +61,16 @@ def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all
                 # Check if correction is needed
                 if revenue_start != expected_revenue_start:
                     # Log the change
-                    changes_log.append({
-                        'Deal': deal_name,
-                        'Close Date': close_date.strftime('%Y-%m-%d'),
-                        'Old Revenue Start': revenue_start.strftime('%Y-%m-%d'),
-                        'New Revenue Start': expected_revenue_start.strftime('%Y-%m-%d'),
-                        'ACV': row.get('ACV (EUR)', ''),
-                        'Commission': row.get('Commission', '')
-                    })
+                    deal_col.append(deal_name)
+                    close_col.append(close_date.strftime('%Y-%m-%d'))
+                    old_col.append(revenue_start.strftime('%Y-%m-%d'))
+                    new_col.append(expected_revenue_start.strftime('%Y-%m-%d'))
+                    acv_col.append(row.get('ACV (EUR)', ''))
+                    commission_col.append(row.get('Commission', ''))
                     
                     # Make the correction
                     df_fixed.at[idx, 'Revenue Start Date'] = expected_revenue_start.strftime('%Y-%m-%d %H:%M:%S')
+                    changed_rows.append(idx)
                     changes_made += 1
                     
             except Exception as e:
@@ -64,12 +82,25 @@ def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all
     print(f"Found {changes_made} CPI/FP increase deals with incorrect revenue start dates")
     
     if changes_made > 0:
-        # Save the fixed file
-        df_fixed.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\nFixed data saved to: {output_file}")
+        if not diff_only:
+            # Save the fixed file
+            df_fixed.to_csv(output_file, index=False, encoding='utf-8-sig')
+            print(f"\nFixed data saved to: {output_file}")
         
         # Save change log
-        change_log_df = pd.DataFrame(changes_log)
+        change_log_df = pd.DataFrame({
+            'Deal': deal_col,
+            'Close Date': close_col,
+            'Old Revenue Start': old_col,
+            'New Revenue Start': new_col,
+            'ACV': acv_col,
+            'Commission': commission_col
+        })
+        if diff_only:
+            # Row numbers are needed to apply the fixes without the full rewrite.
+            # They count data records as read, not physical lines: the header and
+            # blank lines are skipped and a quoted multi-line field stays one row
+            change_log_df.insert(0, 'Data Row', [idx + 1 for idx in changed_rows])
         change_log_file = 'revenue_date_fixes.csv'
         change_log_df.to_csv(change_log_file, index=False)
         print(f"Change log saved to: {change_log_file}")
@@ -80,19 +111,18 @@ def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all
         print(f"{'Deal':<60} {'Old Date':<12} {'New Date':<12}")
         print("-" * 80)
         
-        for change in changes_log[:10]:  # Show first 10
-            deal_short = change['Deal'][:58] + '..' if len(change['Deal']) > 60 else change['Deal']
-            print(f"{deal_short:<60} {change['Old Revenue Start']:<12} {change['New Revenue Start']:<12}")
+        for deal, old_date, new_date in zip(deal_col[:10], old_col, new_col):  # Show first 10
+            deal_short = deal[:58] + '..' if len(deal) > 60 else deal
+            print(f"{deal_short:<60} {old_date:<12} {new_date:<12}")
         
-        if len(changes_log) > 10:
-            print(f"\n... and {len(changes_log) - 10} more changes")
+        if changes_made > 10:
+            print(f"\n... and {changes_made - 10} more changes")
         
         # Group changes by old revenue start pattern
         print("\nCHANGES BY PATTERN:")
         print("-" * 40)
         pattern_counts = {}
-        for change in changes_log:
-            old_date = change['Old Revenue Start']
+        for old_date in old_col:
             pattern_counts[old_date] = pattern_counts.get(old_date, 0) + 1
         
         for date, count in sorted(pattern_counts.items()):
@@ -105,7 +135,9 @@ def fix_revenue_dates(input_file='all_salescookie_credits.csv', output_file='all
 
 if __name__ == "__main__":
     # Allow custom input/output files
-    input_file = sys.argv[1] if len(sys.argv) > 1 else 'all_salescookie_credits.csv'
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'all_salescookie_credits_fixed.csv'
+    diff_only = '--diff-only' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--diff-only']
+    input_file = args[0] if len(args) > 0 else 'all_salescookie_credits.csv'
+    output_file = args[1] if len(args) > 1 else 'all_salescookie_credits_fixed.csv'
     
-    fix_revenue_dates(input_file, output_file)
\ No newline at end of file
+    fix_revenue_dates(input_file, output_file, diff_only=diff_only)
\ No newline at end of file
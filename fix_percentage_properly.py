@@ -4,7 +4,7 @@ Properly fix commission percentage calculation in Excel
 """
 import pandas as pd
 import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
 import sys
 import os
 
@@ -31,15 +31,19 @@ def fix_commission_percentage_properly(excel_file):
     last_row = ws.max_row
     fixed_count = 0
     
-    for row in range(2, last_row + 1):
-        # The correct formula for percentage in Excel
-        # When using percentage format, Excel automatically multiplies by 100
-        # So we should NOT multiply by 100 in the formula
-        formula = f'=IFERROR(F{row}/E{row},0)'
-        
-        ws[f'H{row}'] = formula
-        ws[f'H{row}'].number_format = '0.00%'
-        ws[f'H{row}'].alignment = Alignment(horizontal='right')
+    # One shared named style for the whole column instead of per-cell
+    # number_format/alignment assignments
+    if 'Commission %' not in wb.named_styles:
+        wb.add_named_style(NamedStyle(name='Commission %',
+                                      number_format='0.00%',
+                                      alignment=Alignment(horizontal='right')))
+    
+    # The correct formula for percentage in Excel
+    # When using percentage format, Excel automatically multiplies by 100
+    # So we should NOT multiply by 100 in the formula
+    for (cell,) in ws.iter_rows(min_row=2, max_row=last_row, min_col=8, max_col=8):
+        cell.value = f'=IFERROR(F{cell.row}/E{cell.row},0)'
+        cell.style = 'Commission %'
         fixed_count += 1
     
     # Adjust column width
@@ -52,57 +56,54 @@ def fix_commission_percentage_properly(excel_file):
     print(f"✅ Successfully fixed {fixed_count} commission percentage formulas")
     print(f"📄 Saved as: {output_file}")
     
-    # Now let's verify by reading the values
-    verify_percentages(output_file)
+    # Now let's verify the values, reusing the sheet that is already loaded
+    verify_percentages(output_file, worksheet=ws)
 
-def verify_percentages(excel_file):
-    """Verify the percentages are correct"""
+def _to_number(values):
+    """Strip currency formatting from a column and convert it to floats (NaN if invalid)"""
+    return pd.to_numeric(values.astype(str).str.replace(r'[€,]', '', regex=True), errors='coerce')
+
+def verify_percentages(excel_file, worksheet=None):
+    """Verify the percentages are correct
+    
+    Pass the loaded 'Matched Deals' worksheet to skip parsing excel_file again.
+    """
     try:
-        # Load workbook with data_only=True to get calculated values
-        wb_verify = openpyxl.load_workbook(excel_file, data_only=True)
-        ws_verify = wb_verify['Matched Deals']
+        # Deal name (B), amount (E) and commission (F)
+        if worksheet is not None:
+            # Amount and commission are plain values; a workbook saved by openpyxl
+            # has no cached formula results, so re-reading it would not add any
+            df = pd.DataFrame({
+                name: list(next(worksheet.iter_cols(min_row=2, min_col=col, max_col=col, values_only=True), ()))
+                for name, col in (('deal_name', 2), ('amount', 5), ('commission', 6))
+            })
+        else:
+            # Streams the sheet (read-only, cached values)
+            df = pd.read_excel(excel_file, sheet_name='Matched Deals', usecols='B,E,F')
+            df.columns = ['deal_name', 'amount', 'commission']
+        
+        amount = _to_number(df['amount'])
+        commission = _to_number(df['commission'])
+        valid = (df['deal_name'].notna() & amount.notna() & commission.notna() &
+                 (amount != 0) & (commission != 0))
+        df['pct'] = (commission / amount * 100).where(amount > 0, 0)
         
         print("\n🔍 Verification of commission rates:")
         print("First 10 deals:")
         
-        for row in range(2, min(12, ws_verify.max_row + 1)):
-            deal_name = ws_verify[f'B{row}'].value
-            amount = ws_verify[f'E{row}'].value
-            commission = ws_verify[f'F{row}'].value
-            
-            # Calculate expected percentage
-            if amount and commission:
-                try:
-                    amount_val = float(str(amount).replace('€', '').replace(',', ''))
-                    commission_val = float(str(commission).replace('€', '').replace(',', ''))
-                    expected_pct = (commission_val / amount_val) * 100 if amount_val > 0 else 0
-                    
-                    print(f"  • {deal_name[:50]}... : {expected_pct:.2f}%")
-                except:
-                    pass
+        for deal in df.head(10)[valid.head(10)].itertuples():
+            print(f"  • {str(deal.deal_name)[:50]}... : {deal.pct:.2f}%")
                     
         # Check PS deals specifically
         print("\n🎯 PS Deal verification (should be 1%):")
-        ps_count = 0
-        for row in range(2, ws_verify.max_row + 1):
-            deal_name = ws_verify[f'B{row}'].value
-            if deal_name and 'PS @' in str(deal_name):
-                amount = ws_verify[f'E{row}'].value
-                commission = ws_verify[f'F{row}'].value
-                if amount and commission:
-                    try:
-                        amount_val = float(str(amount).replace('€', '').replace(',', ''))
-                        commission_val = float(str(commission).replace('€', '').replace(',', ''))
-                        pct = (commission_val / amount_val) * 100 if amount_val > 0 else 0
-                        
-                        if ps_count < 5:  # Show first 5 PS deals
-                            status = "✅" if abs(pct - 1.0) < 0.01 else "❌"
-                            print(f"  {status} {deal_name[:40]}... : {pct:.2f}%")
-                        ps_count += 1
-                    except:
-                        pass
+        is_ps = df['deal_name'].astype(str).str.contains('PS @', regex=False)
+        ps_deals = df[is_ps & valid]
+        
+        for deal in ps_deals.head(5).itertuples():  # Show first 5 PS deals
+            status = "✅" if abs(deal.pct - 1.0) < 0.01 else "❌"
+            print(f"  {status} {str(deal.deal_name)[:40]}... : {deal.pct:.2f}%")
                         
-        print(f"\nTotal PS deals found: {ps_count}")
+        print(f"\nTotal PS deals found: {len(ps_deals)}")
         
     except Exception as e:
         print(f"Verification error: {e}")
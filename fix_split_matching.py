@@ -3,6 +3,8 @@
 Fix for split transaction matching issue in reconciliation engine.
 Allows split transactions to create new matches, not just append to existing ones.
 """
+from collections import defaultdict
+
 
 def enhanced_match_splits(self):
     """Enhanced split transaction matching that can create new matches"""
@@ -11,59 +13,78 @@ def enhanced_match_splits(self):
     split_matches = 0
     new_matches_created = 0
     
+    # Index existing matches and HubSpot deals once instead of rescanning them
+    # for every split. Positions are kept so the first hit in list order still wins.
+    matched_ids = {m.hubspot_id for m in self.matches}
+    matches_by_name = {}
+    matches_by_id = {}
+    for pos, match in enumerate(self.matches):
+        matches_by_name.setdefault(match.hubspot_deal.get('deal_name'), (pos, match))
+        matches_by_id.setdefault(match.hubspot_deal.get('hubspot_id'), (pos, match))
+    
+    hs_by_id = {}
+    hs_by_name = defaultdict(list)
+    for pos, hs_deal in enumerate(self.hubspot_deals):
+        hs_by_id.setdefault(hs_deal.get('hubspot_id'), (pos, hs_deal))
+        hs_by_name[hs_deal.get('deal_name')].append((pos, hs_deal))
+    
+    def add_match(hs_deal, split_transaction, confidence, match_type):
+        new_match = MatchResult(
+            hubspot_id=hs_deal['hubspot_id'],
+            salescookie_ids=[split_transaction.get('salescookie_id')],
+            confidence=confidence,
+            match_type=match_type,
+            hubspot_deal=hs_deal,
+            salescookie_transactions=[split_transaction]
+        )
+        pos = len(self.matches)
+        self.matches.append(new_match)
+        matched_ids.add(new_match.hubspot_id)
+        matches_by_name.setdefault(hs_deal.get('deal_name'), (pos, new_match))
+        matches_by_id.setdefault(hs_deal.get('hubspot_id'), (pos, new_match))
+    
     for split_transaction in self.split_transactions:
         matched = False
+        sc_id = split_transaction.get('salescookie_id')
+        deal_name = split_transaction.get('deal_name')
         
         # First, try to find in existing matches (current behavior)
-        for match in self.matches:
-            if (split_transaction.get('deal_name') == match.hubspot_deal.get('deal_name') or
-                split_transaction.get('salescookie_id') == match.hubspot_deal.get('hubspot_id')):
-                match.salescookie_transactions.append(split_transaction)
-                split_matches += 1
-                matched = True
-                break
+        existing = [hit for hit in (matches_by_name.get(deal_name), matches_by_id.get(sc_id))
+                    if hit is not None]
+        if existing:
+            _, match = min(existing, key=lambda hit: hit[0])
+            match.salescookie_transactions.append(split_transaction)
+            split_matches += 1
+            matched = True
         
         if not matched:
-            # NEW: Try to match directly against HubSpot deals
-            for hs_deal in self.hubspot_deals:
-                # Skip if already matched
-                if any(m.hubspot_id == hs_deal['hubspot_id'] for m in self.matches):
-                    continue
-                
-                # Try matching by ID first (highest confidence)
-                if split_transaction.get('salescookie_id') == hs_deal.get('hubspot_id'):
-                    new_match = MatchResult(
-                        hubspot_id=hs_deal['hubspot_id'],
-                        salescookie_ids=[split_transaction.get('salescookie_id')],
-                        confidence=100.0,
-                        match_type='id_match',
-                        hubspot_deal=hs_deal,
-                        salescookie_transactions=[split_transaction]
-                    )
-                    self.matches.append(new_match)
-                    new_matches_created += 1
-                    split_matches += 1
-                    matched = True
-                    break
-                
-                # Try matching by name and date (lower confidence)
-                elif (split_transaction.get('deal_name') == hs_deal.get('deal_name') and
-                      self._dates_match(split_transaction.get('close_date'), 
-                                       hs_deal.get('close_date'), 
-                                       self.DATE_TOLERANCE_DAYS)):
-                    new_match = MatchResult(
-                        hubspot_id=hs_deal['hubspot_id'],
-                        salescookie_ids=[split_transaction.get('salescookie_id')],
-                        confidence=85.0,
-                        match_type='name_date_match',
-                        hubspot_deal=hs_deal,
-                        salescookie_transactions=[split_transaction]
-                    )
-                    self.matches.append(new_match)
-                    new_matches_created += 1
-                    split_matches += 1
-                    matched = True
-                    break
+            # NEW: Try to match directly against unmatched HubSpot deals
+            id_hit = hs_by_id.get(sc_id)
+            if id_hit is not None and id_hit[1]['hubspot_id'] in matched_ids:
+                id_hit = None
+            
+            name_hit = next(
+                (hit for hit in hs_by_name.get(deal_name, ())
+                 if hit[1]['hubspot_id'] not in matched_ids and
+                 self._dates_match(split_transaction.get('close_date'),
+                                   hit[1].get('close_date'),
+                                   self.DATE_TOLERANCE_DAYS)),
+                None
+            )
+            
+            # Try matching by ID first (highest confidence)
+            if id_hit is not None and (name_hit is None or id_hit[0] <= name_hit[0]):
+                add_match(id_hit[1], split_transaction, 100.0, 'id_match')
+                new_matches_created += 1
+                split_matches += 1
+                matched = True
+            
+            # Try matching by name and date (lower confidence)
+            elif name_hit is not None:
+                add_match(name_hit[1], split_transaction, 85.0, 'name_date_match')
+                new_matches_created += 1
+                split_matches += 1
+                matched = True
         
         if not matched:
             # Still no match - add to unmatched list
@@ -2,12 +2,88 @@
 HubSpot CSV Parser for Closed & Won deals
 """
 import pandas as pd
+import os
+import re
+import pickle
+import hashlib
 from datetime import datetime
+from dataclasses import dataclass
 from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class HubSpotDeal:
+    """A Closed & Won HubSpot deal
+    
+    Stored with __slots__ instead of a per-deal dict. Read-only dict-style
+    access (deal['deal_name'], deal.get('company')) is kept for consumers
+    written against the former dict representation.
+    """
+    __slots__ = (
+        'hubspot_id', 'deal_name', 'close_date', 'service_start_date', 'ps_start_date',
+        'amount', 'amount_company_currency', 'currency', 'deal_type', 'product_name',
+        'types_of_acv', 'company', 'owner', 'deployment_type',
+        'acv_software', 'acv_managed_services', 'acv_professional_services',
+        'is_ps_deal', 'commission_amount',
+    )
+    
+    hubspot_id: str
+    deal_name: str
+    close_date: Optional[datetime]
+    service_start_date: Optional[datetime]
+    ps_start_date: Optional[datetime]
+    amount: float
+    amount_company_currency: float
+    currency: str
+    deal_type: str
+    product_name: str
+    types_of_acv: str
+    company: str
+    owner: str
+    deployment_type: str
+    acv_software: float
+    acv_managed_services: float
+    acv_professional_services: float
+    is_ps_deal: bool
+    commission_amount: float
+    
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+        
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+        
+    def get(self, key: str, default=None):
+        """Dict-style get for a deal field"""
+        return getattr(self, key) if key in self.__slots__ else default
+        
+    def keys(self):
+        """Field names, in declaration order"""
+        return self.__slots__
+
+# Short digest of the HubSpotDeal fields, so cached deals pickled with a
+# different slot layout are never loaded
+DEAL_LAYOUT = hashlib.sha1(','.join(HubSpotDeal.__slots__).encode()).hexdigest()[:8]
+
+# Everything after the export's name and path digest in a cache file name (see _cache_path)
+CACHE_SUFFIX_PATTERN = r'\.\d+\.\d+\.v\d+\.[0-9a-f]+\.pkl'
+
+# Cache directory used by the reconcile scripts, next to this module so it does
+# not depend on the current working directory
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+def _sequential_sum(values: pd.Series) -> float:
+    """Left-to-right sum of a column, as the per-deal totals were computed
+    
+    pandas and numpy sum floats pairwise or compensated, which can change the
+    last digits of report totals.
+    """
+    return float(sum(values.tolist()))
+
 class HubSpotParser:
     """Parse HubSpot CSV exports for Closed & Won deals"""
     
@@ -33,17 +109,62 @@ class HubSpotParser:
         'deployment_type': 'Deployment Type',
     }
     
-    def __init__(self, file_path: str):
+    # Columns a HubSpot export must contain
+    REQUIRED_COLUMNS = ['Record ID', 'Deal Name', 'Deal Stage', 'Close Date']
+    
+    # Low-cardinality text columns loaded as categoricals
+    CATEGORY_COLUMNS = ['Currency', 'Deal Stage', 'Deal owner', 'Deployment Type']
+    
+    # Date columns parsed with DATE_FORMATS
+    DATE_COLUMNS = ['Close Date', 'Revenue Start Date', 'Professional Services Start Date']
+    
+    # Formats tried in order for date columns (first match wins)
+    DATE_FORMATS = ['%Y-%m-%d %H:%M', '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']
+    
+    AMOUNT_COLUMNS = [
+        'Amount',
+        'Amount in company currency',
+        'ACV Sales (Software)',
+        'ACV Sales (Managed Services)',
+        'ACV Sales (Professional Services) ',
+    ]
+    
+    # Text columns inspected for PS deal detection
+    TEXT_COLUMNS = ['Deal Name', 'Deal Type']
+    
+    # Bump when parsing changes so previously cached deals are not reused
+    CACHE_VERSION = 2
+    
+    def __init__(self, file_path: str, cache_dir: Optional[str] = None):
         self.file_path = file_path
+        self.cache_dir = cache_dir
         self.deals = []
+        self._df = self._build_frame(self.deals)
         
-    def parse(self) -> List[Dict]:
+    def parse(self) -> List[HubSpotDeal]:
         """Parse HubSpot CSV file and return Closed & Won deals"""
+        cache_path = self._cache_path()
+        if cache_path and os.path.exists(cache_path):
+            deals = self._load_cache(cache_path)
+            if deals is not None:
+                self.deals = deals
+                logger.info(f"Loaded {len(self.deals)} parsed deals from cache {cache_path}")
+                self._df = self._build_frame(self.deals)
+                return self.deals
+            
         try:
-            # Read CSV
-            df = pd.read_csv(self.file_path)
+            # Read CSV, restricted to the mapped columns present in this export
+            header = pd.read_csv(self.file_path, nrows=0).columns
+            columns = [col for col in self.COLUMN_MAPPING.values() if col in header]
+            df = pd.read_csv(
+                self.file_path,
+                usecols=columns,
+                dtype={col: 'category' for col in self.CATEGORY_COLUMNS},
+            )
             logger.info(f"Loaded {len(df)} deals from HubSpot export")
             
+            df = self._preprocess(df)
+            
             # Filter for Closed & Won deals
             closed_won_df = df[df['Deal Stage'] == 'Closed & Won'].copy()
             logger.info(f"Found {len(closed_won_df)} Closed & Won deals")
@@ -51,91 +172,150 @@ class HubSpotParser:
             # Process each deal
             for idx, row in closed_won_df.iterrows():
                 deal = self._process_deal(row)
-                if deal:
-                    # Skip deals with zero commission amount
-                    if deal.get('commission_amount', 0) > 0:
-                        self.deals.append(deal)
-                    else:
-                        logger.debug(f"Skipping zero-value deal: {deal.get('deal_name', 'Unknown')}")
+                
+                # Skip deals with zero commission amount
+                if deal.commission_amount > 0:
+                    self.deals.append(deal)
+                else:
+                    logger.debug(f"Skipping zero-value deal: {deal.deal_name}")
                     
             logger.info(f"Successfully processed {len(self.deals)} deals")
-            return self.deals
+            self._df = self._build_frame(self.deals)
             
         except Exception as e:
             logger.error(f"Error parsing HubSpot CSV: {str(e)}")
             raise
             
-    def _process_deal(self, row: pd.Series) -> Optional[Dict]:
-        """Process a single deal row"""
+        if cache_path:
+            self._save_cache(cache_path)
+        return self.deals
+        
+    def _cache_path(self) -> Optional[str]:
+        """Cache file for this export, keyed on its path, size, modification time and deal layout"""
+        if not self.cache_dir:
+            return None
+        stat = os.stat(self.file_path)
+        return os.path.join(self.cache_dir,
+                            f"{self._cache_prefix()}.{stat.st_size}.{stat.st_mtime_ns}."
+                            f"v{self.CACHE_VERSION}.{DEAL_LAYOUT}.pkl")
+        
+    def _cache_prefix(self) -> str:
+        """Export name plus a digest of its full path, shared by all its cache files"""
+        path_digest = hashlib.sha1(os.path.abspath(self.file_path).encode()).hexdigest()[:8]
+        return f"{os.path.basename(self.file_path)}.{path_digest}"
+        
+    def _load_cache(self, cache_path: str) -> Optional[List[HubSpotDeal]]:
+        """Cached deals, or None if the cache file cannot be read"""
         try:
-            # Extract basic information
-            deal = {
-                'hubspot_id': str(row.get(self.COLUMN_MAPPING['record_id'], '')),
-                'deal_name': row.get(self.COLUMN_MAPPING['deal_name'], ''),
-                'close_date': self._parse_date(row.get(self.COLUMN_MAPPING['close_date'])),
-                'service_start_date': self._parse_date(row.get(self.COLUMN_MAPPING['service_start_date'])),
-                'ps_start_date': self._parse_date(row.get(self.COLUMN_MAPPING['ps_start_date'])),
-                'amount': self._parse_amount(row.get(self.COLUMN_MAPPING['amount'])),
-                'amount_company_currency': self._parse_amount(row.get(self.COLUMN_MAPPING['amount_company_currency'])),
-                'currency': row.get(self.COLUMN_MAPPING['currency'], 'EUR'),
-                'deal_type': row.get(self.COLUMN_MAPPING['deal_type'], ''),
-                'product_name': row.get(self.COLUMN_MAPPING['product_name'], ''),
-                'types_of_acv': row.get(self.COLUMN_MAPPING['types_of_acv'], ''),
-                'company': row.get(self.COLUMN_MAPPING['company'], ''),
-                'owner': row.get(self.COLUMN_MAPPING['owner'], ''),
-                'deployment_type': row.get(self.COLUMN_MAPPING['deployment_type'], ''),
-            }
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable HubSpot cache {cache_path}: {e}")
+            return None
             
-            # Determine if this is a PS deal
-            deal['is_ps_deal'] = self._is_ps_deal(deal)
+    def _save_cache(self, cache_path: str):
+        """Store the parsed deals; a failed write only costs a re-parse next time"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(self.deals, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logger.warning(f"Could not write HubSpot cache {cache_path}: {e}")
+            return
+        self._remove_stale_caches(cache_path)
+        
+    def _remove_stale_caches(self, cache_path: str):
+        """Delete cache files left by earlier versions of this export"""
+        stale = re.compile(re.escape(self._cache_prefix()) + CACHE_SUFFIX_PATTERN)
+        for entry in os.scandir(self.cache_dir):
+            if entry.path != cache_path and stale.fullmatch(entry.name):
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale HubSpot cache {entry.path}: {e}")
             
-            # Extract ACV breakdown
-            deal['acv_breakdown'] = {
-                'software': self._parse_amount(row.get(self.COLUMN_MAPPING['acv_software'])),
-                'managed_services': self._parse_amount(row.get(self.COLUMN_MAPPING['acv_managed_services'])),
-                'professional_services': self._parse_amount(row.get(self.COLUMN_MAPPING['acv_professional_services'])),
-            }
+    def _preprocess(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Validate the export's columns and convert amounts, dates and text column-wise"""
+        missing = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"HubSpot export is missing required columns: {', '.join(missing)}")
             
+        for col in self.AMOUNT_COLUMNS:
+            if col in df.columns:
+                df[col] = self._parse_amounts(df[col])
+                
+        for col in self.DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = self._parse_dates(df[col])
+                
+        for col in self.TEXT_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].fillna('')
+                
+        return df
+        
+    def _process_deal(self, row: pd.Series) -> HubSpotDeal:
+        """Process a single (preprocessed) deal row"""
+        # Extract basic information
+        fields = {
+            'hubspot_id': str(row.get(self.COLUMN_MAPPING['record_id'], '')),
+            'deal_name': row.get(self.COLUMN_MAPPING['deal_name'], ''),
+            'close_date': self._to_datetime(row.get(self.COLUMN_MAPPING['close_date'])),
+            'service_start_date': self._to_datetime(row.get(self.COLUMN_MAPPING['service_start_date'])),
+            'ps_start_date': self._to_datetime(row.get(self.COLUMN_MAPPING['ps_start_date'])),
+            'amount': float(row.get(self.COLUMN_MAPPING['amount'], 0.0)),
+            'amount_company_currency': float(row.get(self.COLUMN_MAPPING['amount_company_currency'], 0.0)),
+            'currency': row.get(self.COLUMN_MAPPING['currency'], 'EUR'),
+            'deal_type': row.get(self.COLUMN_MAPPING['deal_type'], ''),
+            'product_name': row.get(self.COLUMN_MAPPING['product_name'], ''),
+            'types_of_acv': row.get(self.COLUMN_MAPPING['types_of_acv'], ''),
+            'company': row.get(self.COLUMN_MAPPING['company'], ''),
+            'owner': row.get(self.COLUMN_MAPPING['owner'], ''),
+            'deployment_type': row.get(self.COLUMN_MAPPING['deployment_type'], ''),
+        }
+        
+        # Determine if this is a PS deal
+        is_ps_deal = self._is_ps_deal(fields)
+        
+        return HubSpotDeal(
+            **fields,
+            # ACV breakdown
+            acv_software=float(row.get(self.COLUMN_MAPPING['acv_software'], 0.0)),
+            acv_managed_services=float(row.get(self.COLUMN_MAPPING['acv_managed_services'], 0.0)),
+            acv_professional_services=float(row.get(self.COLUMN_MAPPING['acv_professional_services'], 0.0)),
+            is_ps_deal=is_ps_deal,
             # Use company currency amount for commission calculation
-            deal['commission_amount'] = deal['amount_company_currency'] or deal['amount']
-            
-            return deal
-            
-        except Exception as e:
-            logger.warning(f"Error processing deal: {str(e)}")
-            return None
-            
-    def _parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object"""
-        if pd.isna(date_str) or not date_str:
-            return None
+            commission_amount=fields['amount_company_currency'] or fields['amount'],
+        )
+        
+    def _parse_dates(self, values: pd.Series) -> pd.Series:
+        """Parse a date column, trying each known format (NaT if unparseable)"""
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
             
-        try:
-            # Try different date formats
-            for fmt in ['%Y-%m-%d %H:%M', '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']:
-                try:
-                    return datetime.strptime(str(date_str).strip(), fmt)
-                except ValueError:
-                    continue
-                    
-            logger.warning(f"Could not parse date: {date_str}")
-            return None
+        text = values.astype(str).str.strip()
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        for fmt in self.DATE_FORMATS:
+            parsed = parsed.fillna(pd.to_datetime(text, format=fmt, errors='coerce'))
             
-        except Exception as e:
-            logger.warning(f"Error parsing date {date_str}: {str(e)}")
+        unparsed = values.notna() & (text != '') & parsed.isna()
+        if unparsed.any():
+            logger.warning(f"Could not parse {int(unparsed.sum())} date(s) in '{values.name}', "
+                           f"e.g. {values[unparsed].iloc[0]}")
+        return parsed
+        
+    def _to_datetime(self, value) -> Optional[datetime]:
+        """Convert a parsed date value to datetime (None if missing)"""
+        if value is None or pd.isna(value):
             return None
+        return value.to_pydatetime()
             
-    def _parse_amount(self, amount) -> float:
-        """Parse amount to float"""
-        if pd.isna(amount) or amount == '' or amount is None:
-            return 0.0
-            
-        try:
-            # Remove currency symbols and convert
-            amount_str = str(amount).replace('€', '').replace('$', '').replace(',', '').strip()
-            return float(amount_str)
-        except:
-            return 0.0
+    def _parse_amounts(self, values: pd.Series) -> pd.Series:
+        """Parse an amount column to floats (0.0 if missing or invalid)"""
+        # Remove currency symbols and convert
+        cleaned = values.astype(str).str.replace(r'[€$,]', '', regex=True).str.strip()
+        return pd.to_numeric(cleaned, errors='coerce').fillna(0.0)
             
     def _is_ps_deal(self, deal: Dict) -> bool:
         """Determine if deal is a Professional Services deal"""
@@ -144,22 +324,22 @@ class HubSpotParser:
             'PS @' in deal.get('deal_name', ''),
             'professional services' in deal.get('deal_type', '').lower(),
             'ps deal' in deal.get('deal_name', '').lower(),
-            deal.get('acv_breakdown', {}).get('professional_services', 0) > 0 and
-            deal.get('acv_breakdown', {}).get('software', 0) == 0 and
-            deal.get('acv_breakdown', {}).get('managed_services', 0) == 0,
         ]
+        # The ACV split is deliberately not an indicator: it was only filled in
+        # after this check ran, so it never classified a deal as PS, and using
+        # the acv_* values now would reclassify existing deals
         
         return any(indicators)
     
-    def get_deals_by_quarter(self, quarter: str) -> List[Dict]:
+    def get_deals_by_quarter(self, quarter: str) -> List[HubSpotDeal]:
         """Get deals for a specific quarter"""
         quarter_deals = []
         
         for deal in self.deals:
-            if not deal['close_date']:
+            if not deal.close_date:
                 continue
                 
-            deal_quarter = self._get_quarter_from_date(deal['close_date'])
+            deal_quarter = self._get_quarter_from_date(deal.close_date)
             if deal_quarter == quarter:
                 quarter_deals.append(deal)
                 
@@ -179,37 +359,38 @@ class HubSpotParser:
         else:
             return f"Q4_{year}"
             
+    @staticmethod
+    def _build_frame(deals: List[HubSpotDeal]) -> pd.DataFrame:
+        """Build the columnar view of the deals used for aggregation"""
+        return pd.DataFrame({
+            'currency': [deal.currency for deal in deals],
+            'amount': pd.Series([deal.amount for deal in deals], dtype='float64'),
+            'amount_company_currency': pd.Series([deal.amount_company_currency for deal in deals], dtype='float64'),
+            'commission_amount': pd.Series([deal.commission_amount for deal in deals], dtype='float64'),
+            'is_ps_deal': pd.Series([deal.is_ps_deal for deal in deals], dtype='bool'),
+        })
+        
     def summary(self) -> Dict:
         """Get summary statistics"""
-        total_amount = sum(deal['commission_amount'] for deal in self.deals)
-        ps_deals = [d for d in self.deals if d['is_ps_deal']]
-        regular_deals = [d for d in self.deals if not d['is_ps_deal']]
+        df = self._df
+        is_ps = df['is_ps_deal']
         
         return {
-            'total_deals': len(self.deals),
-            'total_amount': total_amount,
-            'ps_deals_count': len(ps_deals),
-            'ps_deals_amount': sum(d['commission_amount'] for d in ps_deals),
-            'regular_deals_count': len(regular_deals),
-            'regular_deals_amount': sum(d['commission_amount'] for d in regular_deals),
+            'total_deals': len(df),
+            'total_amount': _sequential_sum(df['commission_amount']),
+            'ps_deals_count': int(is_ps.sum()),
+            'ps_deals_amount': _sequential_sum(df.loc[is_ps, 'commission_amount']),
+            'regular_deals_count': int((~is_ps).sum()),
+            'regular_deals_amount': _sequential_sum(df.loc[~is_ps, 'commission_amount']),
             'deals_by_currency': self._group_by_currency(),
         }
         
     def _group_by_currency(self) -> Dict:
         """Group deals by currency"""
-        currency_groups = {}
+        currency_groups = self._df.groupby('currency', sort=False, dropna=False).agg(
+            count=('amount', 'size'),
+            amount=('amount', _sequential_sum),
+            amount_company_currency=('amount_company_currency', _sequential_sum),
+        )
         
-        for deal in self.deals:
-            currency = deal['currency']
-            if currency not in currency_groups:
-                currency_groups[currency] = {
-                    'count': 0,
-                    'amount': 0,
-                    'amount_company_currency': 0,
-                }
-                
-            currency_groups[currency]['count'] += 1
-            currency_groups[currency]['amount'] += deal['amount']
-            currency_groups[currency]['amount_company_currency'] += deal['amount_company_currency']
-            
-        return currency_groups
\ No newline at end of file
+        return currency_groups.to_dict('index')
\ No newline at end of file
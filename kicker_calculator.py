@@ -22,10 +22,27 @@ class QuotaProgress:
 class KickerCalculator:
     """Calculate overperformance kickers based on quota achievement"""
     
+    # Overperformance kickers per year: (min achievement %, kicker name, default multiplier),
+    # sorted by threshold descending so the first hit is the highest applicable kicker
+    KICKER_TABLES = {
+        2024: [
+            (200, 'overperformance_200', 2.0),
+            (120, 'overperformance_120', 1.2),
+        ],
+        2025: [
+            (200, 'overperformance_200', 1.5),
+            (180, 'overperformance_180', 1.4),
+            (160, 'overperformance_160', 1.3),
+            (130, 'overperformance_130', 1.2),
+            (100, 'overperformance_100', 1.1),
+        ],
+    }
+    
     def __init__(self, commission_config):
         self.config = commission_config
         self.deals_by_quarter = {}
-        self.quota_progress = {}
+        self.quarter_totals = {}
+        self.quota_progress = {}  # Cached QuotaProgress per quarter
         
     def add_deal(self, deal: Dict) -> None:
         """Add a deal to track for quota calculation"""
@@ -39,12 +56,22 @@ class KickerCalculator:
             self.deals_by_quarter[quarter] = []
             
         self.deals_by_quarter[quarter].append(deal)
+        self.quarter_totals[quarter] = self.quarter_totals.get(quarter, 0) + deal.get('commission_amount', 0)
+        
+        # Quarter total changed, so its cached progress is stale
+        self.quota_progress.pop(quarter, None)
         
     def calculate_quota_progress(self, quarter: str) -> QuotaProgress:
         """Calculate quota achievement for a specific quarter"""
         if quarter not in self.deals_by_quarter:
             return None
             
+        if quarter not in self.quota_progress:
+            self.quota_progress[quarter] = self._compute_quota_progress(quarter)
+        return self.quota_progress[quarter]
+        
+    def _compute_quota_progress(self, quarter: str) -> Optional[QuotaProgress]:
+        """Compute quota achievement for a quarter from its running ACV total"""
         # Extract year from quarter string (e.g., "Q1_2025" -> 2025)
         year = int(quarter.split('_')[1])
         
@@ -54,8 +81,8 @@ class KickerCalculator:
             logger.warning(f"No commission plan found for year {year}")
             return None
             
-        # Calculate total ACV for the quarter
-        total_acv = sum(deal.get('commission_amount', 0) for deal in self.deals_by_quarter[quarter])
+        # Total ACV for the quarter is maintained incrementally in add_deal
+        total_acv = self.quarter_totals[quarter]
         
         # Quarterly quota is annual quota divided by 4
         quarterly_quota = plan.quota_target / 4
@@ -87,22 +114,9 @@ class KickerCalculator:
             return 'earlybird', plan.kickers.get('earlybird', 1.2)
             
         # Check overperformance kickers based on achievement
-        if year == 2024:
-            if achievement >= 200:
-                return 'overperformance_200', plan.kickers.get('overperformance_200', 2.0)
-            elif achievement >= 120:
-                return 'overperformance_120', plan.kickers.get('overperformance_120', 1.2)
-        elif year == 2025:
-            if achievement >= 200:
-                return 'overperformance_200', plan.kickers.get('overperformance_200', 1.5)
-            elif achievement >= 180:
-                return 'overperformance_180', plan.kickers.get('overperformance_180', 1.4)
-            elif achievement >= 160:
-                return 'overperformance_160', plan.kickers.get('overperformance_160', 1.3)
-            elif achievement >= 130:
-                return 'overperformance_130', plan.kickers.get('overperformance_130', 1.2)
-            elif achievement >= 100:
-                return 'overperformance_100', plan.kickers.get('overperformance_100', 1.1)
+        for threshold, kicker_name, default_multiplier in self.KICKER_TABLES.get(year, ()):
+            if achievement >= threshold:
+                return kicker_name, plan.kickers.get(kicker_name, default_multiplier)
                 
         return None, 1.0
         
@@ -6,11 +6,12 @@ Main entry point for reconciling HubSpot deals with SalesCookie commissions
 import click
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from hubspot_parser import HubSpotParser
+from hubspot_parser import HubSpotParser, DEFAULT_CACHE_DIR
 from salescookie_parser import SalesCookieParser
-from reconciliation_engine_v2 import ReconciliationEngineV2 as ReconciliationEngine
+from reconciliation_engine_v2 import ReconciliationEngineV2 as ReconciliationEngine, discrepancy_label
 from report_generator import ReportGenerator
 
 # Configure logging
@@ -61,21 +62,25 @@ def reconcile(hubspot_file, salescookie_dir, output_dir, verbose):
     try:
         click.echo("🚀 Starting Commission Reconciliation Process...")
         
-        # 1. Parse HubSpot data
-        click.echo("\n📊 Parsing HubSpot data...")
-        hs_parser = HubSpotParser(hubspot_file)
-        hubspot_deals = hs_parser.parse()
-        hs_summary = hs_parser.summary()
-        
-        click.echo(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
-        click.echo(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
-        click.echo(f"  ✓ PS deals: {hs_summary['ps_deals_count']}")
-        
-        # 2. Parse SalesCookie data
-        click.echo("\n💰 Parsing SalesCookie data...")
-        sc_parser = SalesCookieParser(salescookie_dir)
-        quarters_data = sc_parser.parse_all_quarters()
-        sc_summary = sc_parser.summary()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # SalesCookie and HubSpot data are independent, parse them concurrently
+            sc_parser = SalesCookieParser(salescookie_dir)
+            sc_future = executor.submit(sc_parser.parse_all_quarters)
+            
+            # 1. Parse HubSpot data
+            click.echo("\n📊 Parsing HubSpot data...")
+            hs_parser = HubSpotParser(hubspot_file, cache_dir=DEFAULT_CACHE_DIR)
+            hubspot_deals = hs_parser.parse()
+            hs_summary = hs_parser.summary()
+            
+            click.echo(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
+            click.echo(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
+            click.echo(f"  ✓ PS deals: {hs_summary['ps_deals_count']}")
+            
+            # 2. Parse SalesCookie data
+            click.echo("\n💰 Parsing SalesCookie data...")
+            quarters_data = sc_future.result()
+            sc_summary = sc_parser.summary()
         
         click.echo(f"  ✓ Found {sc_summary['total_transactions']} transactions")
         click.echo(f"  ✓ Total commission: €{sc_summary['total_commission']:,.2f}")
@@ -104,7 +109,7 @@ def reconcile(hubspot_file, salescookie_dir, output_dir, verbose):
             
             click.echo("\n  Discrepancies by type:")
             for disc_type, data in disc_by_type.items():
-                click.echo(f"    - {disc_type.replace('_', ' ').title()}: {data['count']} (€{data['impact']:,.2f})")
+                click.echo(f"    - {discrepancy_label(disc_type)}: {data['count']} (€{data['impact']:,.2f})")
                 
         # 4. Generate reports
         click.echo("\n📄 Generating reports...")
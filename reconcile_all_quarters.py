@@ -3,63 +3,147 @@
 Reconcile all quarterly SalesCookie data with HubSpot
 """
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from hubspot_parser import HubSpotParser
-from salescookie_parser_v2 import SalesCookieParserV2, DataSource
-from reconciliation_engine_v2 import ReconciliationEngineV2
+from typing import List
+from hubspot_parser import HubSpotParser, DEFAULT_CACHE_DIR
+from salescookie_parser_v2 import SalesCookieParserV2, SalesCookieTransaction, DataSource
+from reconciliation_engine_v2 import ReconciliationEngineV2, discrepancy_label
 from report_generator import ReportGenerator
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns of the combined credits file used to build transactions
+SC_COLUMNS = [
+    'Unique ID', 'Deal Name', 'Customer', 'Close Date', 'Revenue Start Date',
+    'Commission_Numeric', 'Commission Currency', 'Commission Rate', 'Commission Details',
+    'Deal Type', 'ACV (EUR)', 'Currency', 'Types of ACV', 'Product Name', 'Split',
+    'Quarter', 'TCV (Professional Services)',
+]
+
+# Non-ISO date format of the combined file, fixed per separator so a cell's
+# date does not depend on the rest of the file
+SC_DATE_FORMATS = {'.': '%d.%m.%Y', '/': '%m/%d/%Y'}
+
+def parse_sc_dates(values: pd.Series) -> pd.Series:
+    """Parse a combined-file date column (NaT if missing or unparseable)"""
+    # The combined file writes ISO dates; whatever the fast ISO parser rejects
+    # is parsed with the format of its separator, and only the rest falls back
+    # to per-value format inference
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    retry = parsed.isna() & values.notna()
+    if not retry.any():
+        return parsed
+        
+    text = values[retry].astype(str).str.strip()
+    for separator, fmt in SC_DATE_FORMATS.items():
+        has_separator = text.str.contains(separator, regex=False)
+        if has_separator.any():
+            parsed.loc[text.index[has_separator]] = pd.to_datetime(text[has_separator], errors='coerce', format=fmt)
+            
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        logger.warning(f"{int(retry.sum())} date(s) in '{values.name}' do not match "
+                       f"{', '.join(SC_DATE_FORMATS.values())}, inferring their format per value, "
+                       f"e.g. {values[retry].iloc[0]}")
+        parsed[retry] = pd.to_datetime(values[retry], errors='coerce', format='mixed')
+    return parsed
+
+def build_transactions(all_sc_data: pd.DataFrame, sc_parser: SalesCookieParserV2) -> List[SalesCookieTransaction]:
+    """Convert the combined SalesCookie credits into transactions, column by column"""
+    n = len(all_sc_data)
+    
+    def column(name, default=''):
+        if name in all_sc_data.columns:
+            return all_sc_data[name]
+        return pd.Series([default] * n, index=all_sc_data.index, dtype=object)
+    
+    def dates(name):
+        if name not in all_sc_data.columns:
+            return column(name, None)
+        return parse_sc_dates(all_sc_data[name])
+    
+    company_ids, company_names = sc_parser._extract_customer_infos(column('Customer'))
+    
+    columns = {
+        'salescookie_id': column('Unique ID').map(str),
+        'deal_name': column('Deal Name'),
+        'customer': column('Customer'),
+        'close_date': dates('Close Date'),
+        'revenue_start_date': dates('Revenue Start Date'),
+        'commission_amount': pd.to_numeric(column('Commission_Numeric', 0), errors='coerce').fillna(0.0),
+        'commission_currency': column('Commission Currency', 'EUR'),
+        'commission_rate': sc_parser._parse_rates(column('Commission Rate', None)),
+        'commission_details': column('Commission Details'),
+        'deal_type': column('Deal Type'),
+        'acv_eur': sc_parser._parse_amounts(column('ACV (EUR)', None)),
+        'currency': column('Currency', 'EUR'),
+        'types_of_acv': column('Types of ACV'),
+        'product_name': column('Product Name'),
+        'has_split': column('Split').astype(str).str.lower() == 'yes',
+        'is_ps_deal': sc_parser._is_ps_deals(all_sc_data),
+        'data_source': pd.Series(['manual'] * n, index=all_sc_data.index, dtype=object),
+        'quarter': column('Quarter'),
+        'company_id': company_ids,
+        'company_name': company_names,
+    }
+    
+    # Columns are listed in SalesCookieTransaction field order
+    return [SalesCookieTransaction(*values) for values in zip(*(col.tolist() for col in columns.values()))]
+
+def analyze_quarters(matches) -> pd.DataFrame:
+    """Matched deals, HubSpot amount and SalesCookie commission per close date quarter"""
+    df = pd.DataFrame(
+        [(match.hubspot_deal.get('close_date'),
+          match.hubspot_deal.get('commission_amount', 0),
+          sum(sc_trans.get('commission_amount', 0) for sc_trans in match.salescookie_transactions))
+         for match in matches],
+        columns=['close_date', 'hubspot_amount', 'commission'],
+    )
+    df['close_date'] = pd.to_datetime(df['close_date'])
+    df = df[df['close_date'].notna()]
+    
+    # Group on the quarter periods and only format the distinct quarters as labels
+    quarters = df['close_date'].dt.to_period('Q').rename('quarter')
+    analysis = df.groupby(quarters).agg(
+        matched=('close_date', 'size'),
+        hubspot_amount=('hubspot_amount', 'sum'),
+        commission=('commission', 'sum'),
+    )
+    analysis.index = analysis.index.astype(str)
+    return analysis
 
 def main():
     print("🚀 Comprehensive Commission Reconciliation - All Quarters")
     print("=" * 70)
     
-    # 1. Load HubSpot data
-    print("\n📊 Loading HubSpot data...")
-    hs_parser = HubSpotParser('../hubsport_download_20250729/hubspot-crm-exports-tb-deals-2025-07-29.csv')
-    hubspot_deals = hs_parser.parse()
-    hs_summary = hs_parser.summary()
-    
-    print(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
-    print(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
-    
-    # 2. Load all SalesCookie data
-    print("\n💰 Loading all SalesCookie quarterly data...")
-    
-    # Read the combined file we just created
-    all_sc_data = pd.read_csv('./all_salescookie_credits.csv', encoding='utf-8-sig')
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Read the combined SalesCookie file we just created (only the columns we use)
+        # in the background while HubSpot is parsed; the C parser releases the GIL
+        sc_future = executor.submit(pd.read_csv, './all_salescookie_credits.csv', encoding='utf-8-sig',
+                                    usecols=lambda col: col in SC_COLUMNS)
+        
+        # 1. Load HubSpot data
+        print("\n📊 Loading HubSpot data...")
+        hs_parser = HubSpotParser('../hubsport_download_20250729/hubspot-crm-exports-tb-deals-2025-07-29.csv', cache_dir=DEFAULT_CACHE_DIR)
+        hubspot_deals = hs_parser.parse()
+        hs_summary = hs_parser.summary()
+        
+        print(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
+        print(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
+        
+        # 2. Load all SalesCookie data
+        print("\n💰 Loading all SalesCookie quarterly data...")
+        all_sc_data = sc_future.result()
     
     # Convert to format expected by reconciliation engine
     sc_parser = SalesCookieParserV2()
-    all_transactions = []
-    
-    for idx, row in all_sc_data.iterrows():
-        # Parse each row as a transaction
-        transaction = {
-            'salescookie_id': str(row.get('Unique ID', '')),
-            'deal_name': row.get('Deal Name', ''),
-            'customer': row.get('Customer', ''),
-            'close_date': pd.to_datetime(row.get('Close Date'), errors='coerce'),
-            'revenue_start_date': pd.to_datetime(row.get('Revenue Start Date'), errors='coerce'),
-            'commission_amount': float(row.get('Commission_Numeric', 0)),
-            'commission_currency': row.get('Commission Currency', 'EUR'),
-            'commission_rate': sc_parser._parse_rate(row.get('Commission Rate')),
-            'commission_details': row.get('Commission Details', ''),
-            'deal_type': row.get('Deal Type', ''),
-            'acv_eur': sc_parser._parse_amount(row.get('ACV (EUR)')),
-            'currency': row.get('Currency', 'EUR'),
-            'types_of_acv': row.get('Types of ACV', ''),
-            'product_name': row.get('Product Name', ''),
-            'has_split': str(row.get('Split', '')).lower() == 'yes',
-            'is_ps_deal': sc_parser._is_ps_deal(row),
-            'data_source': 'manual',
-            'quarter': row.get('Quarter', ''),
-        }
-        
-        # Extract company info
-        transaction['company_id'], transaction['company_name'] = sc_parser._extract_customer_info(transaction['customer'])
-        
-        all_transactions.append(transaction)
+    all_transactions = build_transactions(all_sc_data, sc_parser)
+    
+    # The frame is not needed anymore, don't keep it alive next to the transactions
+    del all_sc_data
     
     print(f"  ✓ Loaded {len(all_transactions)} total transactions")
     
@@ -89,33 +173,15 @@ def main():
     print("-" * 70)
     
     # Group matches by quarter
-    quarter_analysis = {}
-    
-    for match in results.matches:
-        hs_deal = match.hubspot_deal
-        close_date = hs_deal.get('close_date')
-        if close_date:
-            quarter = f"{close_date.year}Q{(close_date.month-1)//3 + 1}"
-            if quarter not in quarter_analysis:
-                quarter_analysis[quarter] = {
-                    'matched': 0,
-                    'commission': 0,
-                    'hubspot_amount': 0
-                }
-            quarter_analysis[quarter]['matched'] += 1
-            quarter_analysis[quarter]['hubspot_amount'] += hs_deal.get('commission_amount', 0)
-            # Sum commission from SC transactions
-            for sc_trans in match.salescookie_transactions:
-                quarter_analysis[quarter]['commission'] += sc_trans.get('commission_amount', 0)
+    quarter_analysis = analyze_quarters(results.matches)
     
     # Display quarterly results
     print(f"{'Quarter':<10} {'Matched':>10} {'HS Amount':>15} {'SC Commission':>15}")
     print("-" * 70)
     
-    for quarter in sorted(quarter_analysis.keys()):
-        data = quarter_analysis[quarter]
-        print(f"{quarter:<10} {data['matched']:>10} "
-              f"€{data['hubspot_amount']:>14,.2f} €{data['commission']:>14,.2f}")
+    for data in quarter_analysis.itertuples():
+        print(f"{data.Index:<10} {data.matched:>10} "
+              f"€{data.hubspot_amount:>14,.2f} €{data.commission:>14,.2f}")
     
     # 6. Generate comprehensive report
     print("\n📄 Generating comprehensive reports...")
@@ -127,15 +193,7 @@ def main():
     legacy_results = {
         'summary': summary,
         'discrepancies': results.discrepancies,
-        'matched_deals': [
-            {
-                'hubspot': match.hubspot_deal,
-                'salescookie': match.salescookie_transactions,
-                'confidence': match.confidence,
-                'match_type': match.match_type
-            }
-            for match in results.matches
-        ]
+        'matched_deals': results.matches,
     }
     
     generator = ReportGenerator(output_dir)
@@ -156,7 +214,7 @@ def main():
     if summary['total_discrepancies'] > 0:
         print("\n  Discrepancy breakdown:")
         for disc_type, data in summary['discrepancies_by_type'].items():
-            print(f"    - {disc_type.replace('_', ' ').title()}: {data['count']} (€{data['impact']:,.2f})")
+            print(f"    - {discrepancy_label(disc_type)}: {data['count']} (€{data['impact']:,.2f})")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -3,6 +3,7 @@
 Demo reconciliation showing the process and expected results
 """
 import csv
+from collections import Counter
 from datetime import datetime
 
 def analyze_manual_export():
@@ -15,26 +16,46 @@ def analyze_manual_export():
     salescookie_file = '../salescookie_manual/credits (7).csv'
     
     try:
+        # Single streaming pass: only counters and the sample rows are kept
+        total = ids_present = truncated = 0
+        total_commission = 0
+        commission_rates = Counter()
+        samples = []
+        
         with open(salescookie_file, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            records = list(reader)
+            for record in csv.DictReader(f):
+                total += 1
+                if record.get('Unique ID'):
+                    ids_present += 1
+                if record.get('Deal Name', '').endswith('…'):
+                    truncated += 1
+                if len(samples) < 3:
+                    samples.append(record)
+                    
+                try:
+                    commission = float(record.get('Commission', '0').replace(',', ''))
+                    total_commission += commission
+                    
+                    rate = record.get('Commission Rate', 'N/A')
+                    if rate != 'N/A':
+                        commission_rates[rate] += 1
+                except (AttributeError, ValueError):
+                    pass
             
-        print(f"  ✓ Loaded {len(records)} transactions")
+        print(f"  ✓ Loaded {total} transactions")
         
         # Analyze data quality
         print("\n🔍 Data Quality Analysis:")
         
         # Check for Unique IDs
-        ids_present = sum(1 for r in records if r.get('Unique ID'))
-        print(f"  - Unique IDs present: {ids_present}/{len(records)} ({ids_present/len(records)*100:.1f}%)")
+        print(f"  - Unique IDs present: {ids_present}/{total} ({ids_present/total*100:.1f}%)")
         
         # Check for truncated names
-        truncated = sum(1 for r in records if r.get('Deal Name', '').endswith('…'))
-        print(f"  - Truncated deal names: {truncated} ({truncated/len(records)*100:.1f}%)")
+        print(f"  - Truncated deal names: {truncated} ({truncated/total*100:.1f}%)")
         
         # Show sample records
         print("\n📋 Sample Records:")
-        for i, record in enumerate(records[:3]):
+        for i, record in enumerate(samples):
             print(f"\n  Record {i+1}:")
             print(f"    - Unique ID: {record.get('Unique ID', 'N/A')}")
             print(f"    - Deal Name: {record.get('Deal Name', 'N/A')[:50]}...")
@@ -42,24 +63,10 @@ def analyze_manual_export():
             print(f"    - Commission: {record.get('Commission', 'N/A')} {record.get('Commission Currency', '')}")
             print(f"    - Rate: {record.get('Commission Rate', 'N/A')}")
             
-        # Calculate commission statistics
+        # Commission statistics
         print("\n💰 Commission Statistics:")
-        total_commission = 0
-        commission_rates = {}
-        
-        for record in records:
-            try:
-                commission = float(record.get('Commission', '0').replace(',', ''))
-                total_commission += commission
-                
-                rate = record.get('Commission Rate', 'N/A')
-                if rate != 'N/A':
-                    commission_rates[rate] = commission_rates.get(rate, 0) + 1
-            except:
-                pass
-                
         print(f"  - Total commission: €{total_commission:,.2f}")
-        print(f"  - Average commission: €{total_commission/len(records):,.2f}")
+        print(f"  - Average commission: €{total_commission/total:,.2f}")
         
         print("\n  Commission rate distribution:")
         for rate, count in sorted(commission_rates.items()):
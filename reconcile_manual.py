@@ -5,11 +5,12 @@ Direct reconciliation runner for manual exports
 import logging
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from hubspot_parser import HubSpotParser
+from hubspot_parser import HubSpotParser, DEFAULT_CACHE_DIR
 from salescookie_parser_v2 import SalesCookieParserV2, DataSource
-from reconciliation_engine_v2 import ReconciliationEngineV2
+from reconciliation_engine_v2 import ReconciliationEngineV2, discrepancy_label
 from report_generator import ReportGenerator
 
 # Configure logging
@@ -29,20 +30,24 @@ def main():
     print("🚀 Starting Commission Reconciliation with Manual Export...")
     
     try:
-        # 1. Parse HubSpot data
-        print("\n📊 Parsing HubSpot data...")
-        hs_parser = HubSpotParser(hubspot_file)
-        hubspot_deals = hs_parser.parse()
-        hs_summary = hs_parser.summary()
-        
-        print(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
-        print(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
-        print(f"  ✓ PS deals: {hs_summary['ps_deals_count']}")
-        
-        # 2. Parse SalesCookie manual export
-        print("\n💰 Parsing SalesCookie manual export...")
-        sc_parser = SalesCookieParserV2()
-        transactions, quality = sc_parser.parse_file(salescookie_file, DataSource.MANUAL)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # SalesCookie and HubSpot exports are independent, parse them concurrently
+            sc_parser = SalesCookieParserV2()
+            sc_future = executor.submit(sc_parser.parse_file, salescookie_file, DataSource.MANUAL)
+            
+            # 1. Parse HubSpot data
+            print("\n📊 Parsing HubSpot data...")
+            hs_parser = HubSpotParser(hubspot_file, cache_dir=DEFAULT_CACHE_DIR)
+            hubspot_deals = hs_parser.parse()
+            hs_summary = hs_parser.summary()
+            
+            print(f"  ✓ Found {hs_summary['total_deals']} Closed & Won deals")
+            print(f"  ✓ Total amount: €{hs_summary['total_amount']:,.2f}")
+            print(f"  ✓ PS deals: {hs_summary['ps_deals_count']}")
+            
+            # 2. Parse SalesCookie manual export
+            print("\n💰 Parsing SalesCookie manual export...")
+            transactions, quality = sc_future.result()
         
         print(f"  ✓ Loaded {len(transactions)} transactions")
         print(f"  ✓ Data quality score: {quality.quality_score:.1f}/100")
@@ -74,7 +79,7 @@ def main():
             # Show discrepancy breakdown
             print("\n  Discrepancies by type:")
             for disc_type, data in summary['discrepancies_by_type'].items():
-                print(f"    - {disc_type.replace('_', ' ').title()}: {data['count']} (€{data['impact']:,.2f})")
+                print(f"    - {discrepancy_label(disc_type)}: {data['count']} (€{data['impact']:,.2f})")
         
         # 4. Generate reports
         print("\n📄 Generating reports...")
@@ -83,15 +88,7 @@ def main():
         legacy_results = {
             'summary': summary,
             'discrepancies': results.discrepancies,
-            'matched_deals': [
-                {
-                    'hubspot': match.hubspot_deal,
-                    'salescookie': match.salescookie_transactions,
-                    'confidence': match.confidence,
-                    'match_type': match.match_type
-                }
-                for match in results.matches
-            ]
+            'matched_deals': results.matches,
         }
         
         generator = ReportGenerator(output_dir)
@@ -10,7 +10,7 @@ from datetime import datetime
 from pathlib import Path
 from hubspot_parser import HubSpotParser
 from salescookie_parser_v2 import SalesCookieParserV2, DataSource
-from reconciliation_engine_v2 import ReconciliationEngineV2
+from reconciliation_engine_v2 import ReconciliationEngineV2, discrepancy_label
 from report_generator import ReportGenerator
 
 # Configure logging
@@ -74,6 +74,10 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
     if verbose:
         logging.getLogger().setLevel(logging.DEBUG)
         
+    # One timestamp for every file written by this run
+    run_started = datetime.now()
+    run_ts = run_started.strftime('%Y%m%d_%H%M%S')
+    
     # Validate inputs
     if not salescookie_dir and not salescookie_file:
         click.echo("❌ Error: Please provide either --salescookie-dir or --salescookie-file", err=True)
@@ -86,6 +90,9 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
     try:
         click.echo("🚀 Starting Enhanced Commission Reconciliation Process...")
         
+        # Every report of this run goes to output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        
         # 1. Parse HubSpot data
         click.echo("\n📊 Parsing HubSpot data...")
         hs_parser = HubSpotParser(hubspot_file)
@@ -117,21 +124,30 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
         else:
             # Scraped data mode
             click.echo(f"  → Loading scraped data from: {salescookie_dir}")
-            # Find all CSV files
-            import glob
-            csv_files = []
-            for pattern in ['**/credited_transactions*.csv', '**/credits*.csv']:
-                csv_files.extend(glob.glob(os.path.join(salescookie_dir, pattern), recursive=True))
+            # Find all CSV files in one walk (hidden folders skipped, as glob did),
+            # credited_transactions*.csv first and then credits*.csv
+            credited_files, credits_files = [], []
+            for root, dirs, files in os.walk(salescookie_dir):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                for name in files:
+                    if not name.endswith('.csv'):
+                        continue
+                    if name.startswith('credited_transactions'):
+                        credited_files.append(os.path.join(root, name))
+                    elif name.startswith('credits'):
+                        credits_files.append(os.path.join(root, name))
+            csv_files = credited_files + credits_files
                 
             if not csv_files:
                 click.echo("  ⚠️  No transaction CSV files found in directory", err=True)
                 
-            for csv_file in csv_files:
+            # Files are parsed in parallel and reported in order
+            parsed_files = sc_parser.parse_files(
+                csv_files,
+                DataSource.SCRAPED if data_source == 'scraped' else None
+            )
+            for csv_file, transactions, quality in parsed_files:
                 click.echo(f"  → Processing: {os.path.basename(csv_file)}")
-                transactions, quality = sc_parser.parse_file(
-                    csv_file,
-                    DataSource.SCRAPED if data_source == 'scraped' else None
-                )
                 if quality:
                     quality_reports.append(quality)
                     sc_parser.data_quality_reports[csv_file] = quality
@@ -142,18 +158,21 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
         # 3. Data Quality Assessment
         click.echo("\n🔍 Data Quality Assessment...")
         
+        # Average score and unique warnings (in first-seen order) in one pass
+        total_quality = 0.0
+        unique_warnings = {}
+        for report in quality_reports:
+            total_quality += report.quality_score
+            unique_warnings.update(dict.fromkeys(report.warnings))
+        avg_quality = total_quality / len(quality_reports) if quality_reports else 100.0
+        
         if quality_reports:
-            avg_quality = sum(q.quality_score for q in quality_reports) / len(quality_reports)
             click.echo(f"  → Average quality score: {avg_quality:.1f}/100")
             
             # Show warnings
-            all_warnings = []
-            for report in quality_reports:
-                all_warnings.extend(report.warnings)
-                
-            if all_warnings:
+            if unique_warnings:
                 click.echo("\n  ⚠️  Data Quality Warnings:")
-                for warning in set(all_warnings):  # Unique warnings
+                for warning in unique_warnings:
                     click.echo(f"    - {warning}")
                     
             # Check for critical issues
@@ -167,9 +186,8 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
             quality_report = sc_parser.generate_quality_report()
             
             # Save to file
-            os.makedirs(output_dir, exist_ok=True)
-            report_path = os.path.join(output_dir, f"data_quality_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
-            with open(report_path, 'w') as f:
+            report_path = os.path.join(output_dir, f"data_quality_report_{run_ts}.txt")
+            with open(report_path, 'w', encoding='utf-8') as f:
                 f.write(quality_report)
                 
             click.echo(f"  ✓ Quality report saved to: {report_path}")
@@ -179,7 +197,7 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
         # 4. Run reconciliation
         click.echo("\n🔄 Running reconciliation...")
         engine = ReconciliationEngineV2(hubspot_deals, all_transactions)
-        results = engine.reconcile(avg_quality if quality_reports else 100.0)
+        results = engine.reconcile(avg_quality)
         
         summary = results.summary
         click.echo(f"  ✓ Matched {summary['matched_deals_count']} deals")
@@ -205,7 +223,7 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
             # Show discrepancy breakdown
             click.echo("\n  Discrepancies by type:")
             for disc_type, data in summary['discrepancies_by_type'].items():
-                click.echo(f"    - {disc_type.replace('_', ' ').title()}: {data['count']} (€{data['impact']:,.2f})")
+                click.echo(f"    - {discrepancy_label(disc_type)}: {data['count']} (€{data['impact']:,.2f})")
                 
         # 5. Generate reports
         click.echo("\n📄 Generating reports...")
@@ -214,19 +232,11 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
         legacy_results = {
             'summary': summary,
             'discrepancies': results.discrepancies,
-            'matched_deals': [
-                {
-                    'hubspot': match.hubspot_deal,
-                    'salescookie': match.salescookie_transactions,
-                    'confidence': match.confidence,
-                    'match_type': match.match_type
-                }
-                for match in results.matches
-            ]
+            'matched_deals': results.matches,
         }
         
         generator = ReportGenerator(output_dir)
-        report_paths = generator.generate_reports(legacy_results)
+        report_paths = generator.generate_reports(legacy_results, timestamp=run_started)
         
         click.echo("  ✓ Reports generated:")
         click.echo(f"    - Excel: {report_paths['excel']}")
@@ -236,9 +246,9 @@ def reconcile(hubspot_file, salescookie_dir, salescookie_file, data_source, outp
         # 6. Generate scraper requirements if using scraped data
         if salescookie_dir and avg_quality < 80:
             click.echo("\n📋 Generating scraper optimization report...")
-            scraper_report_path = os.path.join(output_dir, f"scraper_requirements_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            scraper_report_path = os.path.join(output_dir, f"scraper_requirements_{run_ts}.txt")
             
-            with open(scraper_report_path, 'w') as f:
+            with open(scraper_report_path, 'w', encoding='utf-8') as f:
                 f.write(generate_scraper_requirements(quality_reports, results))
                 
             click.echo(f"  ✓ Scraper requirements saved to: {scraper_report_path}")
@@ -278,15 +288,13 @@ def generate_scraper_requirements(quality_reports, results):
     
     report.append("\nIDENTIFIED ISSUES:")
     
-    # Analyze quality issues
-    issues = set()
-    for qr in quality_reports:
-        if qr.truncated_names > 0:
-            issues.add("Deal names are being truncated")
-        if 'Unique ID' in qr.missing_fields:
-            issues.add("Unique IDs are missing or not properly extracted")
-        if qr.quality_score < 70:
-            issues.add("Overall data quality is poor")
+    # Analyze quality issues; each check stops at the first report showing it
+    issue_checks = [
+        ("Deal names are being truncated", lambda qr: qr.truncated_names > 0),
+        ("Unique IDs are missing or not properly extracted", lambda qr: 'Unique ID' in qr.missing_fields),
+        ("Overall data quality is poor", lambda qr: qr.quality_score < 70),
+    ]
+    issues = [issue for issue, check in issue_checks if any(check(qr) for qr in quality_reports)]
             
     for issue in issues:
         report.append(f"  - {issue}")
@@ -4,16 +4,15 @@ Enhanced Commission Reconciliation Tool v3
 Supports withholding, forecast, and split transaction analysis
 """
 import click
-import pandas as pd
 from datetime import datetime
 import os
+import re
 import sys
 import logging
-from dataclasses import asdict
+from collections import Counter
+from operator import attrgetter, itemgetter
 from hubspot_parser import HubSpotParser
 from salescookie_parser_v2 import SalesCookieParserV2, DataSource
-from reconciliation_engine_v3 import ReconciliationEngineV3
-from report_generator_v3 import ReportGeneratorV3
 
 # Set up logging
 logging.basicConfig(
@@ -22,6 +21,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Keywords that classify a SalesCookie file by its (lowercased) name; the
+# lookaheads let overlapping keywords such as 'creditsplit' all be found
+FILE_KIND_PATTERN = re.compile(
+    r'(?=(?P<withholding>withholding))|(?=(?P<split>split))|(?=(?P<estimated>estimated))'
+    r'|(?=(?P<forecast>forecast))|(?=(?P<credits>credits))'
+)
+
+# Fields copied from each match, and from its HubSpot deal, into the report rows
+MATCH_FIELDS = attrgetter('hubspot_id', 'salescookie_id', 'match_type', 'confidence',
+                          'hubspot_deal', 'salescookie_transactions')
+DEAL_FIELDS = itemgetter('deal_name', 'close_date', 'service_start_date', 'commission_amount')
+
+def _matched_deal_rows(matches):
+    """Flatten matches into the dicts expected by the report generator"""
+    rows = []
+    for match in matches:
+        hubspot_id, salescookie_id, match_type, confidence, deal, transactions = MATCH_FIELDS(match)
+        deal_name, close_date, service_start_date, hubspot_amount = DEAL_FIELDS(deal)
+        rows.append({
+            'hubspot_id': hubspot_id,
+            'salescookie_id': salescookie_id,
+            'match_type': match_type,
+            'confidence': confidence,
+            'hubspot_deal': deal,
+            'salescookie_transactions': transactions,
+            # Include additional fields for reporting
+            'deal_name': deal_name,
+            'close_date': close_date,
+            'service_start_date': service_start_date,
+            'revenue_start_date': service_start_date,  # Alias for compatibility
+            'hubspot_amount': hubspot_amount,
+            'salescookie_amount': sum(t.get('commission_amount', 0) for t in transactions),
+        })
+    return rows
+
+def _collect_csv_files(dirpath, predicate=None):
+    """Full paths of the CSV files in dirpath whose lowercased name passes predicate"""
+    with os.scandir(dirpath) as entries:
+        return [entry.path for entry in entries
+                if entry.name.endswith('.csv') and entry.is_file()
+                and (predicate is None or predicate(entry.name.lower()))]
+
 @click.command()
 @click.option('--hubspot-file', required=True, help='Path to HubSpot CSV export')
 @click.option('--salescookie-file', help='Path to manual SalesCookie CSV export')
@@ -90,62 +131,49 @@ def reconcile(hubspot_file, salescookie_file, salescookie_dir, output_dir,
                 
         else:
             # Directory mode - load multiple files
-            files_to_load = []
-            
             # Determine which files to load based on flags
             if all_types or (not include_withholdings and not include_forecasts and not include_splits):
                 # Load all files if --all-types or no specific flags
-                files_to_load = [f for f in os.listdir(salescookie_dir) if f.endswith('.csv')]
+                wanted = None
             else:
                 # Load specific file types
-                for file in os.listdir(salescookie_dir):
-                    if file.endswith('.csv'):
-                        file_lower = file.lower()
-                        
+                def wanted(file_lower):
+                    kinds = {match.lastgroup for match in FILE_KIND_PATTERN.finditer(file_lower)}
+                    return bool(
                         # Regular credit files
-                        if 'credits' in file_lower and 'withholding' not in file_lower and 'split' not in file_lower and 'estimated' not in file_lower:
-                            files_to_load.append(file)
-                            
+                        ('credits' in kinds and not kinds & {'withholding', 'split', 'estimated'})
                         # Withholding files
-                        elif include_withholdings and 'withholding' in file_lower:
-                            files_to_load.append(file)
-                            
+                        or (include_withholdings and 'withholding' in kinds)
                         # Forecast files
-                        elif include_forecasts and ('estimated' in file_lower or 'forecast' in file_lower):
-                            files_to_load.append(file)
-                            
+                        or (include_forecasts and kinds & {'estimated', 'forecast'})
                         # Split files
-                        elif include_splits and 'split' in file_lower:
-                            files_to_load.append(file)
+                        or (include_splits and 'split' in kinds)
+                    )
+                    
+            files_to_load = _collect_csv_files(salescookie_dir, wanted)
                             
             # Load selected files
             click.echo(f"  Loading {len(files_to_load)} files from {salescookie_dir}")
             
-            for file in sorted(files_to_load):
-                filepath = os.path.join(salescookie_dir, file)
+            # Files are parsed in parallel and reported in order; parse_file
+            # logs and returns no data for a file it cannot read
+            for filepath, transactions, quality in sc_parser.parse_files(sorted(files_to_load)):
+                file = os.path.basename(filepath)
                 click.echo(f"  - {file}...", nl=False)
                 
-                try:
-                    transactions, quality = sc_parser.parse_file(filepath)
-                    if transactions:
-                        all_transactions.extend(transactions)
-                        click.echo(f" ✓ ({len(transactions)} transactions)")
-                    else:
-                        click.echo(" ⚠️  (no data)")
-                        
-                    if quality:
-                        quality_reports.append((file, quality))
-                        
-                except Exception as e:
-                    click.echo(f" ❌ (error: {str(e)})")
+                if transactions:
+                    all_transactions.extend(transactions)
+                    click.echo(f" ✓ ({len(transactions)} transactions)")
+                else:
+                    click.echo(" ⚠️  (no data)")
+                    
+                if quality:
+                    quality_reports.append((file, quality))
                     
         click.echo(f"\n  ✓ Total transactions loaded: {len(all_transactions)}")
         
         # Show transaction type breakdown
-        tx_types = {}
-        for tx in all_transactions:
-            tx_type = tx.get('transaction_type', 'regular')
-            tx_types[tx_type] = tx_types.get(tx_type, 0) + 1
+        tx_types = Counter(tx.get('transaction_type', 'regular') for tx in all_transactions)
             
         if len(tx_types) > 1:
             click.echo("\n  Transaction types:")
@@ -168,6 +196,10 @@ def reconcile(hubspot_file, salescookie_file, salescookie_dir, output_dir,
         click.echo("\n" + sc_parser.generate_quality_report())
         return
         
+    # Only needed past the quality check, keep them off the --quality-check path
+    from reconciliation_engine_v3 import ReconciliationEngineV3
+    from report_generator_v3 import ReportGeneratorV3
+    
     # 4. Run Reconciliation
     click.echo("\n🔄 Running enhanced reconciliation...")
     try:
@@ -181,25 +213,9 @@ def reconcile(hubspot_file, salescookie_file, salescookie_dir, output_dir,
         # Convert result object to dict for report generator
         results_dict = {
             'summary': results.summary,
-            'discrepancies': [asdict(d) for d in results.discrepancies],
-            'matched_deals': [
-                {
-                    'hubspot_id': m.hubspot_id,
-                    'salescookie_id': m.salescookie_id,
-                    'match_type': m.match_type,
-                    'confidence': m.confidence,
-                    'hubspot_deal': m.hubspot_deal,
-                    'salescookie_transactions': m.salescookie_transactions,
-                    # Include additional fields for reporting
-                    'deal_name': m.hubspot_deal.get('deal_name'),
-                    'close_date': m.hubspot_deal.get('close_date'),
-                    'service_start_date': m.hubspot_deal.get('service_start_date'),
-                    'revenue_start_date': m.hubspot_deal.get('service_start_date'),  # Alias for compatibility
-                    'hubspot_amount': m.hubspot_deal.get('commission_amount', 0),
-                    'salescookie_amount': sum(t.get('commission_amount', 0) for t in m.salescookie_transactions),
-                }
-                for m in results.matches
-            ],
+            # Discrepancy is a flat dataclass, a shallow copy of its fields is enough
+            'discrepancies': [vars(d).copy() for d in results.discrepancies],
+            'matched_deals': _matched_deal_rows(results.matches),
             'unmatched_hubspot': results.unmatched_hubspot,
             'unmatched_salescookie': results.unmatched_salescookie,
             'all_deals': hubspot_deals,  # Include all HubSpot deals for complete reporting
@@ -212,31 +228,35 @@ def reconcile(hubspot_file, salescookie_file, salescookie_dir, output_dir,
             traceback.print_exc()
         sys.exit(1)
         
-    # 5. Display Results
+    # 5. Display Results (collected and written in one go)
     summary = results.summary
-    click.echo(f"\n📊 RECONCILIATION RESULTS")
-    click.echo("=" * 70)
-    click.echo(f"  ✓ Matched {summary['matched_deals_count']} deals "
-              f"({summary['match_rate']:.1f}%)")
-    click.echo(f"  ℹ️  Centrally Processed (CPI/Fix): {summary['centrally_processed_count']} transactions")
-    click.echo(f"  ⚠️  Discrepancies: {summary['total_discrepancies']}")
-    click.echo(f"  💸 Total impact: €{summary['total_impact']:,.2f}")
+    output = [
+        f"\n📊 RECONCILIATION RESULTS",
+        "=" * 70,
+        f"  ✓ Matched {summary['matched_deals_count']} deals "
+        f"({summary['match_rate']:.1f}%)",
+        f"  ℹ️  Centrally Processed (CPI/Fix): {summary['centrally_processed_count']} transactions",
+        f"  ⚠️  Discrepancies: {summary['total_discrepancies']}",
+        f"  💸 Total impact: €{summary['total_impact']:,.2f}",
+    ]
     
     # Show withholding summary if applicable
     if 'withholding_summary' in summary and summary['withholding_transactions'] > 0:
         wh = summary['withholding_summary']
-        click.echo(f"\n  💰 Withholding Summary:")
-        click.echo(f"     - Paid (50%): €{wh['total_paid']:,.2f}")
-        click.echo(f"     - Withheld: €{wh['total_withheld']:,.2f}")
-        click.echo(f"     - Full value: €{wh['total_full_commission']:,.2f}")
+        output.append(f"\n  💰 Withholding Summary:")
+        output.append(f"     - Paid (50%): €{wh['total_paid']:,.2f}")
+        output.append(f"     - Withheld: €{wh['total_withheld']:,.2f}")
+        output.append(f"     - Full value: €{wh['total_full_commission']:,.2f}")
         
     # Show forecast summary if applicable
     if 'forecast_summary' in summary and summary['forecast_transactions'] > 0:
         fc = summary['forecast_summary']
-        click.echo(f"\n  📈 Forecast Summary:")
-        click.echo(f"     - Total forecast: €{fc['total_forecast_amount']:,.2f}")
-        click.echo(f"     - Total kickers: €{fc['total_kickers']:,.2f}")
-        click.echo(f"     - Deals with kickers: {fc['deals_with_kickers']}")
+        output.append(f"\n  📈 Forecast Summary:")
+        output.append(f"     - Total forecast: €{fc['total_forecast_amount']:,.2f}")
+        output.append(f"     - Total kickers: €{fc['total_kickers']:,.2f}")
+        output.append(f"     - Deals with kickers: {fc['deals_with_kickers']}")
+        
+    click.echo("\n".join(output))
     
     # 6. Generate Reports
     click.echo("\n📄 Generating reports...")
@@ -2,6 +2,7 @@
 Commission Reconciliation Engine
 Validates HubSpot deals against SalesCookie commission data
 """
+from collections import Counter, defaultdict
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import logging
@@ -13,6 +14,11 @@ logger = logging.getLogger(__name__)
 @dataclass
 class Discrepancy:
     """Represents a discrepancy between HubSpot and SalesCookie"""
+    __slots__ = (
+        'deal_id', 'deal_name', 'discrepancy_type', 'expected_value', 'actual_value',
+        'impact_eur', 'severity', 'details',
+    )
+    
     deal_id: str
     deal_name: str
     discrepancy_type: str  # missing_deal, wrong_amount, wrong_rate, wrong_quarter, etc.
@@ -31,6 +37,13 @@ class ReconciliationEngine:
         self.discrepancies = []
         self.matched_deals = []
         self.config = CommissionConfig()
+        # SalesCookie transactions by deal id, built while matching
+        self._sc_by_id = {}
+        # Transactions per (SalesCookie id, ACV), to spot split credits
+        self._acv_counts = Counter()
+        # Input totals, summed while matching
+        self._total_hubspot_amount = 0
+        self._total_sc_commission = 0
         
     def reconcile(self) -> Dict:
         """Run full reconciliation process"""
@@ -42,19 +55,13 @@ class ReconciliationEngine:
         # 2. Check for missing deals
         self._check_missing_deals()
         
-        # 3. Validate commission calculations
-        self._validate_commissions()
-        
-        # 4. Validate quarter allocations
-        self._validate_quarter_splits()
-        
-        # 5. Validate currency handling
-        self._validate_currency_conversions()
+        # 3-5. Validate commission calculations, quarter allocations and currency handling
+        self._validate_matches()
         
         # Generate summary
         summary = self._generate_summary()
         
-        logger.info(f"Reconciliation complete. Found {len(self.discrepancies)} discrepancies")
+        logger.info("Reconciliation complete. Found %d discrepancies", len(self.discrepancies))
         
         return {
             'summary': summary,
@@ -65,17 +72,20 @@ class ReconciliationEngine:
     def _match_deals(self):
         """Match HubSpot deals with SalesCookie transactions"""
         # Create lookup dictionary for SalesCookie transactions
-        sc_by_id = {}
+        sc_by_id = self._sc_by_id
         for transaction in self.salescookie_transactions:
             deal_id = transaction['salescookie_id']
             if deal_id not in sc_by_id:
                 sc_by_id[deal_id] = []
             sc_by_id[deal_id].append(transaction)
+            self._acv_counts[deal_id, transaction.get('acv_eur')] += 1
+            self._total_sc_commission += transaction['commission_amount']
             
         # Match deals
         for hs_deal in self.hubspot_deals:
             deal_id = hs_deal['hubspot_id']
             sc_transactions = sc_by_id.get(deal_id, [])
+            self._total_hubspot_amount += hs_deal['commission_amount']
             
             if sc_transactions:
                 self.matched_deals.append({
@@ -85,10 +95,9 @@ class ReconciliationEngine:
                 
     def _check_missing_deals(self):
         """Check for HubSpot deals missing in SalesCookie"""
-        matched_ids = {m['hubspot']['hubspot_id'] for m in self.matched_deals}
-        
+        # A deal is matched exactly when SalesCookie has transactions for its id
         for hs_deal in self.hubspot_deals:
-            if hs_deal['hubspot_id'] not in matched_ids:
+            if hs_deal['hubspot_id'] not in self._sc_by_id:
                 # Deal is missing in SalesCookie
                 # We can't know the expected commission without knowing the rate
                 # So we'll use a conservative estimate or flag it differently
@@ -104,124 +113,121 @@ class ReconciliationEngine:
                     details=f"Closed Won deal worth €{hs_deal['commission_amount']:,.2f} not found in SalesCookie"
                 ))
                 
-    def _validate_commissions(self):
-        """Validate commission calculations for matched deals using SalesCookie rates"""
+    def _validate_matches(self):
+        """Run all checks on each matched deal in a single pass"""
+        # Collected per check so the discrepancies keep the order of separate passes
+        commission_issues, split_issues, currency_issues = [], [], []
         for match in self.matched_deals:
             hs_deal = match['hubspot']
             sc_transactions = match['salescookie']
+            self._validate_commission(hs_deal, sc_transactions, commission_issues)
+            # Only deals with a service start date can be split across quarters
+            if hs_deal['service_start_date']:
+                self._validate_quarter_split(hs_deal, sc_transactions, split_issues)
+            self._validate_currency_conversion(hs_deal, currency_issues)
             
-            # For each SalesCookie transaction, validate the calculation
-            for sc_tx in sc_transactions:
-                sc_amount = sc_tx['commission_amount']
-                sc_rate = sc_tx.get('commission_rate', 0)
-                # Use ACV amount from SalesCookie itself, not HubSpot
-                sc_acv = sc_tx.get('acv_eur', 0)
-                is_split = sc_tx.get('has_split', False)
-                
-                # Skip if no rate or ACV available
-                if sc_rate == 0 or sc_acv == 0:
-                    continue
-                    
-                # Calculate what the commission should be based on SC's own ACV and rate
-                expected_based_on_sc_data = sc_acv * sc_rate
-                
-                # For split deals, the commission is divided (usually 50/50)
-                if is_split:
-                    # Count how many transactions we have for this deal
-                    same_deal_count = len([t for t in sc_transactions if t.get('acv_eur') == sc_acv])
-                    if same_deal_count > 1:
-                        expected_based_on_sc_data = expected_based_on_sc_data / same_deal_count
-                
-                # Check if the math is correct (allow 1 EUR tolerance for rounding)
-                if abs(expected_based_on_sc_data - sc_amount) > 1.0:
-                    self.discrepancies.append(Discrepancy(
-                        deal_id=hs_deal['hubspot_id'],
-                        deal_name=hs_deal['deal_name'],
-                        discrepancy_type='calculation_error',
-                        expected_value=f"€{sc_acv:,.2f} × {sc_rate*100:.2f}% = €{expected_based_on_sc_data:,.2f}{' (split)' if is_split else ''}",
-                        actual_value=f"€{sc_amount:,.2f}",
-                        impact_eur=abs(expected_based_on_sc_data - sc_amount),
-                        severity='high' if abs(expected_based_on_sc_data - sc_amount) > 100 else 'medium',
-                        details=f"SalesCookie internal calculation error: ACV × rate ≠ commission{' (split deal)' if is_split else ''}"
-                    ))
-                
-    def _validate_quarter_splits(self):
-        """Validate quarter allocation for split deals"""
-        for match in self.matched_deals:
-            hs_deal = match['hubspot']
-            sc_transactions = match['salescookie']
+        self.discrepancies.extend(commission_issues)
+        self.discrepancies.extend(split_issues)
+        self.discrepancies.extend(currency_issues)
+        
+    def _validate_commission(self, hs_deal: Dict, sc_transactions: List[Dict], issues: List[Discrepancy]):
+        """Validate commission calculations for a matched deal using SalesCookie rates"""
+        # For each SalesCookie transaction, validate the calculation
+        for sc_tx in sc_transactions:
+            sc_amount = sc_tx['commission_amount']
+            sc_rate = sc_tx.get('commission_rate', 0)
+            # Use ACV amount from SalesCookie itself, not HubSpot
+            sc_acv = sc_tx.get('acv_eur', 0)
+            is_split = sc_tx.get('has_split', False)
             
-            # Skip if no service start date (no split expected)
-            if not hs_deal['service_start_date']:
+            # Skip if no rate or ACV available
+            if sc_rate == 0 or sc_acv == 0:
                 continue
                 
-            # Calculate expected quarters
-            expected_quarters = self.config.calculate_split_quarters(
-                hs_deal['close_date'],
-                hs_deal['service_start_date']
-            )
+            # Calculate what the commission should be based on SC's own ACV and rate
+            expected_based_on_sc_data = sc_acv * sc_rate
             
-            # Get actual quarters from SalesCookie
-            actual_quarters = {t['quarter']: t['commission_amount'] for t in sc_transactions}
+            # For split deals, the commission is divided (usually 50/50)
+            if is_split:
+                # Count how many transactions we have for this deal
+                same_deal_count = self._acv_counts[hs_deal['hubspot_id'], sc_acv]
+                if same_deal_count > 1:
+                    expected_based_on_sc_data = expected_based_on_sc_data / same_deal_count
             
-            # Check if quarters match
-            for expected_q, expected_split in expected_quarters.items():
-                if expected_q not in actual_quarters:
-                    self.discrepancies.append(Discrepancy(
-                        deal_id=hs_deal['hubspot_id'],
-                        deal_name=hs_deal['deal_name'],
-                        discrepancy_type='missing_quarter_split',
-                        expected_value=f"{expected_q} ({expected_split*100}%)",
-                        actual_value="Not found",
-                        impact_eur=hs_deal['commission_amount'] * expected_split * 0.073,  # Approximate
-                        severity='medium',
-                        details=f"Expected commission split in {expected_q} not found"
-                    ))
-                    
-    def _validate_currency_conversions(self):
-        """Validate currency handling for international deals"""
-        for match in self.matched_deals:
-            hs_deal = match['hubspot']
+            # Check if the math is correct (allow 1 EUR tolerance for rounding)
+            if abs(expected_based_on_sc_data - sc_amount) > 1.0:
+                issues.append(Discrepancy(
+                    deal_id=hs_deal['hubspot_id'],
+                    deal_name=hs_deal['deal_name'],
+                    discrepancy_type='calculation_error',
+                    expected_value=f"€{sc_acv:,.2f} × {sc_rate*100:.2f}% = €{expected_based_on_sc_data:,.2f}{' (split)' if is_split else ''}",
+                    actual_value=f"€{sc_amount:,.2f}",
+                    impact_eur=abs(expected_based_on_sc_data - sc_amount),
+                    severity='high' if abs(expected_based_on_sc_data - sc_amount) > 100 else 'medium',
+                    details=f"SalesCookie internal calculation error: ACV × rate ≠ commission{' (split deal)' if is_split else ''}"
+                ))
             
-            # Check if deal has currency conversion (non-EUR original currency)
-            if hs_deal['currency'] != 'EUR' and hs_deal['amount_company_currency'] != hs_deal['amount']:
-                # This is an international deal with currency conversion
-                if hs_deal['amount_company_currency'] == 0:
-                    self.discrepancies.append(Discrepancy(
-                        deal_id=hs_deal['hubspot_id'],
-                        deal_name=hs_deal['deal_name'],
-                        discrepancy_type='missing_currency_conversion',
-                        expected_value=f"Company currency amount for {hs_deal['currency']} deal",
-                        actual_value="€0.00",
-                        impact_eur=0,  # Can't calculate without conversion rate
-                        severity='high',
-                        details=f"Deal in {hs_deal['currency']} missing company currency (EUR) amount"
-                    ))
-                    
+    def _validate_quarter_split(self, hs_deal: Dict, sc_transactions: List[Dict], issues: List[Discrepancy]):
+        """Validate quarter allocation for a deal with a service start date"""
+        # Calculate expected quarters
+        expected_quarters = self.config.calculate_split_quarters(
+            hs_deal['close_date'],
+            hs_deal['service_start_date']
+        )
+        
+        # Get actual quarters from SalesCookie
+        actual_quarters = {t['quarter'] for t in sc_transactions}
+        
+        # Check if quarters match
+        for expected_q, expected_split in expected_quarters.items():
+            if expected_q not in actual_quarters:
+                issues.append(Discrepancy(
+                    deal_id=hs_deal['hubspot_id'],
+                    deal_name=hs_deal['deal_name'],
+                    discrepancy_type='missing_quarter_split',
+                    expected_value=f"{expected_q} ({expected_split*100}%)",
+                    actual_value="Not found",
+                    impact_eur=hs_deal['commission_amount'] * expected_split * 0.073,  # Approximate
+                    severity='medium',
+                    details=f"Expected commission split in {expected_q} not found"
+                ))
+                
+    def _validate_currency_conversion(self, hs_deal: Dict, issues: List[Discrepancy]):
+        """Validate currency handling for an international deal"""
+        # Check if deal has currency conversion (non-EUR original currency)
+        if hs_deal['currency'] != 'EUR' and hs_deal['amount_company_currency'] != hs_deal['amount']:
+            # This is an international deal with currency conversion
+            if hs_deal['amount_company_currency'] == 0:
+                issues.append(Discrepancy(
+                    deal_id=hs_deal['hubspot_id'],
+                    deal_name=hs_deal['deal_name'],
+                    discrepancy_type='missing_currency_conversion',
+                    expected_value=f"Company currency amount for {hs_deal['currency']} deal",
+                    actual_value="€0.00",
+                    impact_eur=0,  # Can't calculate without conversion rate
+                    severity='high',
+                    details=f"Deal in {hs_deal['currency']} missing company currency (EUR) amount"
+                ))
+                
         
     def _generate_summary(self) -> Dict:
         """Generate reconciliation summary"""
-        total_hubspot_amount = sum(d['commission_amount'] for d in self.hubspot_deals)
-        total_sc_commission = sum(t['commission_amount'] for t in self.salescookie_transactions)
-        
-        # Group discrepancies by type
-        disc_by_type = {}
+        # Group discrepancies by type and total their impact in the same pass
+        disc_by_type = defaultdict(lambda: {'count': 0, 'impact': 0.0})
+        total_impact = 0
         for disc in self.discrepancies:
-            if disc.discrepancy_type not in disc_by_type:
-                disc_by_type[disc.discrepancy_type] = {
-                    'count': 0,
-                    'impact': 0.0,
-                }
-            disc_by_type[disc.discrepancy_type]['count'] += 1
-            disc_by_type[disc.discrepancy_type]['impact'] += disc.impact_eur
+            entry = disc_by_type[disc.discrepancy_type]
+            entry['count'] += 1
+            entry['impact'] += disc.impact_eur
+            total_impact += disc.impact_eur
             
         return {
             'hubspot_deals_count': len(self.hubspot_deals),
-            'hubspot_total_amount': total_hubspot_amount,
+            'hubspot_total_amount': self._total_hubspot_amount,
             'salescookie_transactions_count': len(self.salescookie_transactions),
-            'salescookie_total_commission': total_sc_commission,
+            'salescookie_total_commission': self._total_sc_commission,
             'matched_deals_count': len(self.matched_deals),
             'total_discrepancies': len(self.discrepancies),
-            'discrepancies_by_type': disc_by_type,
-            'total_impact': sum(d.impact_eur for d in self.discrepancies),
+            'discrepancies_by_type': dict(disc_by_type),
+            'total_impact': total_impact,
         }
\ No newline at end of file
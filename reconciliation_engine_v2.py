@@ -1,9 +1,12 @@
 """
 Enhanced Reconciliation Engine with improved matching and quality awareness
 """
+from collections import Counter, defaultdict
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 import logging
+import re
 from dataclasses import dataclass
 from commission_config import CommissionConfig
 
@@ -12,6 +15,11 @@ logger = logging.getLogger(__name__)
 @dataclass
 class MatchResult:
     """Represents a match between HubSpot and SalesCookie"""
+    __slots__ = (
+        'hubspot_id', 'salescookie_id', 'match_type', 'confidence',
+        'hubspot_deal', 'salescookie_transactions',
+    )
+    
     hubspot_id: str
     salescookie_id: str
     match_type: str  # 'id', 'name_date', 'company_date', 'fuzzy'
@@ -22,6 +30,11 @@ class MatchResult:
 @dataclass
 class ReconciliationResult:
     """Complete reconciliation results"""
+    __slots__ = (
+        'matches', 'unmatched_hubspot', 'unmatched_salescookie',
+        'discrepancies', 'summary', 'data_quality_score',
+    )
+    
     matches: List[MatchResult]
     unmatched_hubspot: List[Dict]
     unmatched_salescookie: List[Dict]
@@ -43,6 +56,74 @@ class Discrepancy:
     match_confidence: float = 0.0
     data_source: str = "unknown"
     
+# Display labels for the discrepancy types raised by the engines
+DISCREPANCY_LABELS = {
+    disc_type: disc_type.replace('_', ' ').title()
+    for disc_type in (
+        'missing_deal', 'wrong_commission_amount', 'calculation_error',
+        'withholding_mismatch', 'incorrect_revenue_date',
+        'missing_quarter_split', 'missing_currency_conversion',
+    )
+}
+
+def discrepancy_label(disc_type: str) -> str:
+    """Display label for a discrepancy type, e.g. 'missing_deal' -> 'Missing Deal'"""
+    return DISCREPANCY_LABELS.get(disc_type) or disc_type.replace('_', ' ').title()
+    
+@lru_cache(maxsize=1024, typed=True)
+def _deal_type_of(product_name, types_of_acv, deployment_type, is_ps_deal) -> str:
+    """Commission deal type for a product / types of ACV / deployment combination"""
+    # Check product name and types of ACV
+    product = str(product_name).lower()
+    acv_types = str(types_of_acv).lower()
+    deployment = str(deployment_type).lower()
+    
+    # Priority order for type detection
+    if 'indexation' in product or 'parameter' in product:
+        return 'indexations_parameter'
+    elif 'managed' in acv_types or 'managed' in product:
+        if 'public' in deployment or 'rcloud' in deployment:
+            return 'managed_services_public'
+        else:
+            return 'managed_services_private'
+    elif 'professional services' in acv_types and not is_ps_deal:
+        return 'recurring_professional_services'
+    else:
+        return 'software'
+        
+# Company suffixes stripped before matching, applied in this order
+COMPANY_SUFFIX_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'\s*\(.*\)$',  # Remove anything in parentheses
+        r'\s*(gmbh|ag|bank|aktiengesellschaft|abp|oyj|inc\.|inc|ltd|limited|plc|s\.a\.|sa).*$',
+        r'\s*&\s*co\.?.*$',
+        r'\s*kommanditgesellschaft.*$',
+    )
+]
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+
+# Lowercased deal names of CPI / FP / Fixed Price Increase and indexation deals,
+# which are handled centrally and not in HubSpot
+CENTRALLY_PROCESSED_PATTERN = re.compile(r'cpi increase|fp increase|fixed price increase|indexation')
+
+@lru_cache(maxsize=4096)
+def _normalized_company(company_name: str) -> str:
+    """Company name normalized for matching, e.g. 'Acme GmbH (Berlin)' -> 'acme'"""
+    if not company_name:
+        return ""
+        
+    name = company_name.lower().strip()
+    
+    # Remove common suffixes
+    for suffix in COMPANY_SUFFIX_PATTERNS:
+        name = suffix.sub('', name)
+        
+    # Remove special characters and normalize whitespace
+    name = NON_WORD_PATTERN.sub(' ', name)
+    name = ' '.join(name.split())
+    
+    return name
+    
 class ReconciliationEngineV2:
     """Enhanced reconciliation with multiple matching strategies"""
     
@@ -53,6 +134,15 @@ class ReconciliationEngineV2:
         self.discrepancies = []
         self.config = CommissionConfig()
         self.centrally_processed_transactions = []
+        # HubSpot and SalesCookie ids in self.matches, kept current by _record_match
+        self._matched_hs_ids = set()
+        self._matched_sc_ids = set()
+        
+    def _record_match(self, match: MatchResult):
+        """Add a match and remember its HubSpot and SalesCookie ids as matched"""
+        self.matches.append(match)
+        self._matched_hs_ids.add(match.hubspot_id)
+        self._matched_sc_ids.update(sc.get('salescookie_id') for sc in match.salescookie_transactions)
         
     def reconcile(self, data_quality_score: float = 100.0) -> ReconciliationResult:
         """Run enhanced reconciliation process"""
@@ -98,7 +188,7 @@ class ReconciliationEngineV2:
             hs_id = str(hs_deal['hubspot_id'])
             
             if hs_id in sc_by_id:
-                self.matches.append(MatchResult(
+                self._record_match(MatchResult(
                     hubspot_id=hs_id,
                     salescookie_id=hs_id,
                     match_type='id',
@@ -115,9 +205,15 @@ class ReconciliationEngineV2:
         logger.info("Matching by name and date...")
         
         # Skip already matched deals
-        matched_hs_ids = {m.hubspot_id for m in self.matches}
-        matched_sc_ids = {sc.get('salescookie_id') for m in self.matches for sc in m.salescookie_transactions}
+        matched_hs_ids = self._matched_hs_ids
+        matched_sc_ids = self._matched_sc_ids
         
+        # Only transactions with the exact same name can match, so index them by
+        # name (keeping their order) instead of scanning all of them per deal
+        sc_by_name = defaultdict(list)
+        for sc_deal in self.salescookie_transactions:
+            sc_by_name[sc_deal.get('deal_name', '')].append(sc_deal)
+            
         matches_found = 0
         
         for hs_deal in self.hubspot_deals:
@@ -128,7 +224,7 @@ class ReconciliationEngineV2:
             hs_date = hs_deal.get('close_date')
             
             if hs_name and hs_date:
-                for sc_deal in self.salescookie_transactions:
+                for sc_deal in sc_by_name.get(hs_name, ()):
                     if sc_deal.get('salescookie_id') in matched_sc_ids:
                         continue
                         
@@ -140,7 +236,7 @@ class ReconciliationEngineV2:
                         sc_date and 
                         abs((hs_date - sc_date).days) <= 1):
                         
-                        self.matches.append(MatchResult(
+                        self._record_match(MatchResult(
                             hubspot_id=hs_deal['hubspot_id'],
                             salescookie_id=sc_deal.get('salescookie_id', ''),
                             match_type='name_date',
@@ -148,8 +244,6 @@ class ReconciliationEngineV2:
                             hubspot_deal=hs_deal,
                             salescookie_transactions=[sc_deal]
                         ))
-                        matched_hs_ids.add(hs_deal['hubspot_id'])
-                        matched_sc_ids.add(sc_deal.get('salescookie_id'))
                         matches_found += 1
                         break
                         
@@ -160,9 +254,16 @@ class ReconciliationEngineV2:
         logger.info("Matching by company and date...")
         
         # Skip already matched deals
-        matched_hs_ids = {m.hubspot_id for m in self.matches}
-        matched_sc_ids = {sc.get('salescookie_id') for m in self.matches for sc in m.salescookie_transactions}
+        matched_hs_ids = self._matched_hs_ids
+        matched_sc_ids = self._matched_sc_ids
         
+        # Bucket the transactions not matched yet by normalized company (keeping
+        # their order), so each deal only looks at transactions of its company
+        sc_by_company = defaultdict(list)
+        for sc_deal in self.salescookie_transactions:
+            if sc_deal.get('salescookie_id') not in matched_sc_ids:
+                sc_by_company[self._normalize_company(sc_deal.get('company_name', ''))].append(sc_deal)
+                
         matches_found = 0
         
         for hs_deal in self.hubspot_deals:
@@ -174,21 +275,23 @@ class ReconciliationEngineV2:
             hs_amount = hs_deal.get('commission_amount', 0)
             
             if hs_company and hs_date:
-                potential_matches = []
+                # Best candidate so far; the first one wins on equal confidence
+                best_match = None
+                best_confidence = None
                 
-                for sc_deal in self.salescookie_transactions:
+                for sc_deal in sc_by_company.get(hs_company, ()):
                     if sc_deal.get('salescookie_id') in matched_sc_ids:
                         continue
                         
-                    sc_company = self._normalize_company(sc_deal.get('company_name', ''))
                     sc_date = sc_deal.get('close_date')
-                    
-                    if (hs_company == sc_company and 
-                        sc_date and 
-                        abs((hs_date - sc_date).days) <= 7):
+                    if not sc_date:
+                        continue
                         
+                    # Days between the close dates, reused for the confidence below
+                    date_diff = abs((hs_date - sc_date).days)
+                    
+                    if date_diff <= 7:
                         # Calculate confidence based on date difference and amount
-                        date_diff = abs((hs_date - sc_date).days)
                         confidence = 80.0 - (date_diff * 5)  # Reduce confidence by 5% per day
                         
                         # Check if amounts are similar (within 10%)
@@ -196,14 +299,14 @@ class ReconciliationEngineV2:
                         if sc_acv > 0 and abs(hs_amount - sc_acv) / sc_acv < 0.1:
                             confidence += 10  # Boost confidence for matching amounts
                             
-                        potential_matches.append((sc_deal, confidence))
+                        if best_match is None or confidence > best_confidence:
+                            best_match, best_confidence = sc_deal, confidence
                         
                 # Take the best match if found
-                if potential_matches:
-                    best_match = max(potential_matches, key=lambda x: x[1])
-                    sc_deal, confidence = best_match
+                if best_match is not None:
+                    sc_deal, confidence = best_match, best_confidence
                     
-                    self.matches.append(MatchResult(
+                    self._record_match(MatchResult(
                         hubspot_id=hs_deal['hubspot_id'],
                         salescookie_id=sc_deal.get('salescookie_id', ''),
                         match_type='company_date',
@@ -211,36 +314,14 @@ class ReconciliationEngineV2:
                         hubspot_deal=hs_deal,
                         salescookie_transactions=[sc_deal]
                     ))
-                    matched_hs_ids.add(hs_deal['hubspot_id'])
-                    matched_sc_ids.add(sc_deal.get('salescookie_id'))
                     matches_found += 1
                     
         logger.info(f"Matched {matches_found} additional deals by company and date")
         
     def _normalize_company(self, company_name: str) -> str:
         """Normalize company name for matching"""
-        if not company_name:
-            return ""
-            
-        import re
-        name = company_name.lower().strip()
-        
-        # Remove common suffixes
-        suffixes = [
-            r'\s*\(.*\)$',  # Remove anything in parentheses
-            r'\s*(gmbh|ag|bank|aktiengesellschaft|abp|oyj|inc\.|inc|ltd|limited|plc|s\.a\.|sa).*$',
-            r'\s*&\s*co\.?.*$',
-            r'\s*kommanditgesellschaft.*$',
-        ]
-        
-        for suffix in suffixes:
-            name = re.sub(suffix, '', name, flags=re.IGNORECASE)
-            
-        # Remove special characters and normalize whitespace
-        name = re.sub(r'[^\w\s]', ' ', name)
-        name = ' '.join(name.split())
-        
-        return name
+        # The same companies recur on many deals and transactions, normalize each once
+        return _normalized_company(company_name)
         
     def _validate_matches(self):
         """Validate commission calculations for matched deals"""
@@ -256,8 +337,9 @@ class ReconciliationEngineV2:
             actual_commission = sum(t.get('commission_amount', 0) for t in sc_transactions)
             
             # Check for discrepancy (allow 1 EUR tolerance)
-            if abs(expected_commission - actual_commission) > 1.0:
-                severity = 'high' if abs(expected_commission - actual_commission) > 100 else 'medium'
+            difference = abs(expected_commission - actual_commission)
+            if difference > 1.0:
+                severity = 'high' if difference > 100 else 'medium'
                 
                 self.discrepancies.append(Discrepancy(
                     deal_id=hs_deal['hubspot_id'],
@@ -265,7 +347,7 @@ class ReconciliationEngineV2:
                     discrepancy_type='wrong_commission_amount',
                     expected_value=f"€{expected_commission:,.2f}",
                     actual_value=f"€{actual_commission:,.2f}",
-                    impact_eur=abs(expected_commission - actual_commission),
+                    impact_eur=difference,
                     severity=severity,
                     details=f"Match confidence: {match.confidence:.0f}%",
                     match_confidence=match.confidence,
@@ -274,10 +356,8 @@ class ReconciliationEngineV2:
                 
     def _check_unmatched_deals(self):
         """Check for HubSpot deals not found in SalesCookie"""
-        matched_hs_ids = {m.hubspot_id for m in self.matches}
-        
         for hs_deal in self.hubspot_deals:
-            if hs_deal['hubspot_id'] not in matched_hs_ids:
+            if hs_deal['hubspot_id'] not in self._matched_hs_ids:
                 year = hs_deal['close_date'].year if hs_deal['close_date'] else datetime.now().year
                 expected_commission = self._calculate_expected_commission(hs_deal, year)
                 
@@ -310,23 +390,13 @@ class ReconciliationEngineV2:
             
     def _determine_deal_type(self, deal: Dict) -> str:
         """Determine deal type for commission calculation"""
-        # Check product name and types of ACV
-        product = str(deal.get('product_name', '')).lower()
-        acv_types = str(deal.get('types_of_acv', '')).lower()
-        deployment = str(deal.get('deployment_type', '')).lower()
-        
-        # Priority order for type detection
-        if 'indexation' in product or 'parameter' in product:
-            return 'indexations_parameter'
-        elif 'managed' in acv_types or 'managed' in product:
-            if 'public' in deployment or 'rcloud' in deployment:
-                return 'managed_services_public'
-            else:
-                return 'managed_services_private'
-        elif 'professional services' in acv_types and not deal.get('is_ps_deal', False):
-            return 'recurring_professional_services'
-        else:
-            return 'software'
+        # Deals share a handful of product / ACV type combinations, classify each once
+        return _deal_type_of(
+            deal.get('product_name', ''),
+            deal.get('types_of_acv', ''),
+            deal.get('deployment_type', ''),
+            deal.get('is_ps_deal', False),
+        )
             
     def _identify_centrally_processed_transactions(self):
         """Identify and auto-process CPI and FP Increase deals that are centrally processed"""
@@ -334,13 +404,14 @@ class ReconciliationEngineV2:
         
         centrally_processed_count = 0
         remaining_transactions = []
+        is_centrally_processed = CENTRALLY_PROCESSED_PATTERN.search
         
         for transaction in self.salescookie_transactions:
             deal_name = transaction.get('deal_name', '').lower()
             
             # Check if this is a centrally processed deal
             # CPI Increase, FP Increase, and Fixed Price Increase deals are handled centrally, not in HubSpot
-            if any(indicator in deal_name for indicator in ['cpi increase', 'fp increase', 'fixed price increase', 'indexation']):
+            if is_centrally_processed(deal_name):
                 # Auto-process these transactions
                 transaction['auto_processed'] = True
                 transaction['processing_type'] = 'centrally_managed'
@@ -364,10 +435,10 @@ class ReconciliationEngineV2:
                     },
                     salescookie_transactions=[transaction]
                 )
-                self.matches.append(auto_match)
+                self._record_match(auto_match)
                 
                 centrally_processed_count += 1
-                logger.debug(f"Auto-processed centrally managed deal: {transaction.get('deal_name')}")
+                logger.debug("Auto-processed centrally managed deal: %s", transaction.get('deal_name'))
             else:
                 remaining_transactions.append(transaction)
         
@@ -380,34 +451,29 @@ class ReconciliationEngineV2:
     def _generate_result(self, data_quality_score: float) -> ReconciliationResult:
         """Generate comprehensive reconciliation result"""
         # Separate matched and unmatched
-        matched_hs_ids = {m.hubspot_id for m in self.matches}
-        matched_sc_ids = {sc.get('salescookie_id') for m in self.matches for sc in m.salescookie_transactions}
-        
-        unmatched_hubspot = [d for d in self.hubspot_deals if d['hubspot_id'] not in matched_hs_ids]
+        unmatched_hubspot = [d for d in self.hubspot_deals if d['hubspot_id'] not in self._matched_hs_ids]
         unmatched_salescookie = [t for t in self.salescookie_transactions 
-                               if t.get('salescookie_id') not in matched_sc_ids]
+                               if t.get('salescookie_id') not in self._matched_sc_ids]
         
         # Calculate summary statistics
         total_hs_amount = sum(d['commission_amount'] for d in self.hubspot_deals)
         total_sc_commission = sum(t.get('commission_amount', 0) for t in self.salescookie_transactions)
         
-        # Group discrepancies by type
-        disc_by_type = {}
+        # Group discrepancies by type and total their impact in the same pass
+        disc_by_type = defaultdict(lambda: {'count': 0, 'impact': 0.0})
+        total_impact = 0
         for disc in self.discrepancies:
-            if disc.discrepancy_type not in disc_by_type:
-                disc_by_type[disc.discrepancy_type] = {
-                    'count': 0,
-                    'impact': 0.0,
-                }
-            disc_by_type[disc.discrepancy_type]['count'] += 1
-            disc_by_type[disc.discrepancy_type]['impact'] += disc.impact_eur
+            entry = disc_by_type[disc.discrepancy_type]
+            entry['count'] += 1
+            entry['impact'] += disc.impact_eur
+            total_impact += disc.impact_eur
             
         # Match confidence statistics
-        match_by_type = {}
+        match_by_type = Counter()
+        total_confidence = 0
         for match in self.matches:
-            if match.match_type not in match_by_type:
-                match_by_type[match.match_type] = 0
             match_by_type[match.match_type] += 1
+            total_confidence += match.confidence
             
         # Calculate totals including centrally processed
         total_sc_transactions_original = len(self.salescookie_transactions) + len(self.centrally_processed_transactions)
@@ -425,10 +491,10 @@ class ReconciliationEngineV2:
             'unmatched_hubspot_count': len(unmatched_hubspot),
             'unmatched_salescookie_count': len(unmatched_salescookie),
             'total_discrepancies': len(self.discrepancies),
-            'discrepancies_by_type': disc_by_type,
-            'matches_by_type': match_by_type,
-            'total_impact': sum(d.impact_eur for d in self.discrepancies),
-            'average_match_confidence': sum(m.confidence for m in self.matches) / len(self.matches) if self.matches else 0,
+            'discrepancies_by_type': dict(disc_by_type),
+            'matches_by_type': dict(match_by_type),
+            'total_impact': total_impact,
+            'average_match_confidence': total_confidence / len(self.matches) if self.matches else 0,
             'data_quality_score': data_quality_score,
             'match_rate': (len(self.matches) / len(self.hubspot_deals) * 100) if len(self.hubspot_deals) > 0 else 0,
         }
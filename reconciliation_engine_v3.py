@@ -109,6 +109,7 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                     
                     # Add withholding info to match
                     match.salescookie_transactions.append(wh_transaction)
+                    self._matched_sc_ids.add(wh_transaction.get('salescookie_id'))
                     withholding_matches += 1
                     
                     # Create discrepancy if commission doesn't match withholding pattern
@@ -151,6 +152,7 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                 if (split_transaction.get('deal_name') == match.hubspot_deal.get('deal_name') or
                     split_transaction.get('salescookie_id') == match.hubspot_deal.get('hubspot_id')):
                     match.salescookie_transactions.append(split_transaction)
+                    self._matched_sc_ids.add(split_transaction.get('salescookie_id'))
                     split_matches += 1
                     matched = True
                     break
@@ -159,7 +161,7 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                 # NEW: Try to match directly against HubSpot deals
                 for hs_deal in self.hubspot_deals:
                     # Skip if already matched
-                    if any(m.hubspot_id == hs_deal['hubspot_id'] for m in self.matches):
+                    if hs_deal['hubspot_id'] in self._matched_hs_ids:
                         continue
                     
                     # Try matching by ID first (highest confidence)
@@ -172,7 +174,7 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                             hubspot_deal=hs_deal,
                             salescookie_transactions=[split_transaction]
                         )
-                        self.matches.append(new_match)
+                        self._record_match(new_match)
                         new_matches_created += 1
                         split_matches += 1
                         matched = True
@@ -191,7 +193,7 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                             hubspot_deal=hs_deal,
                             salescookie_transactions=[split_transaction]
                         )
-                        self.matches.append(new_match)
+                        self._record_match(new_match)
                         new_matches_created += 1
                         split_matches += 1
                         matched = True
@@ -300,15 +302,16 @@ class ReconciliationEngineV3(ReconciliationEngineV2):
                     expected_based_on_sc_data = expected_based_on_sc_data / 2
                 
                 # Check if the math is correct (allow 1 EUR tolerance for rounding)
-                if abs(expected_based_on_sc_data - sc_amount) > 1.0:
+                difference = abs(expected_based_on_sc_data - sc_amount)
+                if difference > 1.0:
                     self.discrepancies.append(Discrepancy(
                         deal_id=hs_deal['hubspot_id'],
                         deal_name=hs_deal['deal_name'],
                         discrepancy_type='calculation_error',
                         expected_value=f"€{sc_acv:,.2f} × {sc_rate*100:.2f}% = €{expected_based_on_sc_data:,.2f}{' (split)' if is_split else ''}",
                         actual_value=f"€{sc_amount:,.2f}",
-                        impact_eur=abs(expected_based_on_sc_data - sc_amount),
-                        severity='high' if abs(expected_based_on_sc_data - sc_amount) > 100 else 'medium',
+                        impact_eur=difference,
+                        severity='high' if difference > 100 else 'medium',
                         details=f"SalesCookie internal calculation error: ACV × rate ≠ commission"
                                 f"{' (split deal)' if is_split else ''}"
                                 f"{' (withholding: 50% payment)' if withholding_txs else ''}",
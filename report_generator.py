@@ -243,8 +243,12 @@ class ReportGenerator:
             
         # Data
         for row, match in enumerate(matched_deals, 2):
+            if not isinstance(match, dict):
+                # MatchResult objects, passed straight from the reconciliation engine
+                hs_deal = match.hubspot_deal
+                sc_transactions = match.salescookie_transactions
             # Handle the new format from reconcile_v3
-            if 'hubspot_deal' in match:
+            elif 'hubspot_deal' in match:
                 hs_deal = match['hubspot_deal']
                 sc_transactions = match['salescookie_transactions']
             else:
@@ -4,15 +4,59 @@ Supports both manual exports and scraped data
 """
 import pandas as pd
 import os
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 import re
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# Characters stripped in a single translate() pass before float conversion
+_AMOUNT_STRIP = str.maketrans('', '', '€$,')
+_RATE_STRIP = str.maketrans('', '', '%')
+
+# Rate and customer cells repeat heavily across a credits export, so their
+# parsers are memoized on the raw value (typed, so 1 and '1' stay apart).
+# Amounts are mostly unique and are not cached. Missing values are handled
+# by the callers, since NaN keys would only fill the caches.
+
+def _parse_amount_value(amount) -> float:
+    """Parse amount to float"""
+    if pd.isna(amount) or amount == '' or amount is None:
+        return 0.0
+        
+    try:
+        # Remove currency symbols and thousands separators
+        return float(str(amount).translate(_AMOUNT_STRIP))
+    except ValueError:
+        return 0.0
+        
+@lru_cache(maxsize=4096, typed=True)
+def _parse_rate_value(rate_str) -> float:
+    """Parse commission rate percentage"""
+    if not rate_str:
+        return 0.0
+        
+    try:
+        return float(str(rate_str).translate(_RATE_STRIP)) / 100.0
+    except ValueError:
+        return 0.0
+        
+@lru_cache(maxsize=4096, typed=True)
+def _split_customer(customer_str) -> Tuple[str, str]:
+    """Extract company ID and name from customer field"""
+    customer_str = str(customer_str)
+    if ';' in customer_str:
+        parts = customer_str.split(';', 1)
+        if len(parts) == 2:
+            return parts[0].strip(), parts[1].strip()
+            
+    return '', customer_str.strip()
+
 class DataSource(Enum):
     MANUAL = "manual"
     SCRAPED = "scraped"
@@ -36,6 +80,65 @@ class DataQualityReport:
     quality_score: float  # 0-100
     warnings: List[str]
     
+@dataclass
+class SalesCookieTransaction:
+    """A SalesCookie credit, as built from the combined all-quarters file
+    
+    Stored with __slots__ instead of a per-transaction dict. Dict-style access
+    is kept for code shared with the dict transactions from parse_file; the
+    reconciliation engine may tag a transaction with the processing fields,
+    which are absent until set.
+    """
+    __slots__ = (
+        'salescookie_id', 'deal_name', 'customer', 'close_date', 'revenue_start_date',
+        'commission_amount', 'commission_currency', 'commission_rate', 'commission_details',
+        'deal_type', 'acv_eur', 'currency', 'types_of_acv', 'product_name',
+        'has_split', 'is_ps_deal', 'data_source', 'quarter', 'company_id', 'company_name',
+        'auto_processed', 'processing_type', 'processing_note',
+    )
+    
+    salescookie_id: str
+    deal_name: str
+    customer: str
+    close_date: Optional[datetime]
+    revenue_start_date: Optional[datetime]
+    commission_amount: float
+    commission_currency: str
+    commission_rate: float
+    commission_details: str
+    deal_type: str
+    acv_eur: float
+    currency: str
+    types_of_acv: str
+    product_name: str
+    has_split: bool
+    is_ps_deal: bool
+    data_source: str
+    quarter: str
+    company_id: str
+    company_name: str
+    
+    def __getitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+            
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+        
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and hasattr(self, key)
+        
+    def get(self, key: str, default=None):
+        """Dict-style get for a transaction field"""
+        return getattr(self, key, default) if key in self.__slots__ else default
+        
+    def keys(self):
+        """Names of the fields that are set, in declaration order"""
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
 class SalesCookieParserV2:
     """Enhanced parser supporting both manual and scraped SalesCookie data"""
     
@@ -213,6 +316,44 @@ class SalesCookieParserV2:
             logger.error(f"Error parsing {file_path}: {str(e)}")
             return [], None
             
+    def parse_files(self, file_paths: List[str], source: DataSource = None) -> Iterator[Tuple[str, List[Dict], DataQualityReport]]:
+        """Parse independent files in worker processes, yielding (path, transactions, quality) in order"""
+        if len(file_paths) <= 1:
+            # Not worth starting a pool for
+            for file_path in file_paths:
+                yield (file_path, *self.parse_file(file_path, source))
+            return
+            
+        workers = min(len(file_paths), os.cpu_count() or 1)
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"Could not start worker processes, parsing files serially: {e}")
+            for file_path in file_paths:
+                yield (file_path, *self.parse_file(file_path, source))
+            return
+            
+        with executor:
+            futures = [self._submit(executor, file_path, source) for file_path in file_paths]
+            for file_path, future in zip(file_paths, futures):
+                # parse_file handles its own errors, so a failure here is the pool's
+                # (a crashed worker, an unpicklable result); parse in this process
+                try:
+                    transactions, quality = future.result()
+                except Exception as e:
+                    logger.warning(f"Worker failed on {file_path}, parsing it serially: {e!r}")
+                    transactions, quality = self.parse_file(file_path, source)
+                yield file_path, transactions, quality
+                
+    def _submit(self, executor: ProcessPoolExecutor, file_path: str, source: DataSource) -> Future:
+        """Schedule parse_file on the pool; a broken pool yields an already failed future"""
+        try:
+            return executor.submit(self.parse_file, file_path, source)
+        except BrokenExecutor as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+                
     def _read_csv_safe(self, file_path: str) -> Optional[pd.DataFrame]:
         """Safely read CSV with multiple encoding and separator attempts"""
         encodings = ['utf-8-sig', 'utf-8', 'latin1', 'cp1252']
@@ -241,30 +382,35 @@ class SalesCookieParserV2:
         if 'Unique ID' in df.columns:
             df = df[df['Unique ID'].notna()].copy()
             
+        # Per-row helpers bound once outside the loop
+        parse_date = self._parse_date
+        parse_amount = self._parse_amount
+        parse_rate = self._parse_rate
+        
         for idx, row in df.iterrows():
             try:
                 transaction = {
                     'salescookie_id': str(row.get('Unique ID', '')),
                     'deal_name': row.get('Deal Name', ''),
                     'customer': row.get('Customer', ''),
-                    'close_date': self._parse_date(row.get('Close Date')),
-                    'revenue_start_date': self._parse_date(row.get('Revenue Start Date')),
-                    'commission_amount': self._parse_amount(row.get('Commission')),
+                    'close_date': parse_date(row.get('Close Date')),
+                    'revenue_start_date': parse_date(row.get('Revenue Start Date')),
+                    'commission_amount': parse_amount(row.get('Commission')),
                     'commission_currency': row.get('Commission Currency', 'EUR'),
-                    'commission_rate': self._parse_rate(row.get('Commission Rate')),
+                    'commission_rate': parse_rate(row.get('Commission Rate')),
                     'commission_details': row.get('Commission Details', ''),
                     'deal_type': row.get('Deal Type', ''),
-                    'acv_eur': self._parse_amount(row.get('ACV (EUR)')),
+                    'acv_eur': parse_amount(row.get('ACV (EUR)')),
                     'currency': row.get('Currency', 'EUR'),
                     'types_of_acv': row.get('Types of ACV', ''),
                     'product_name': row.get('Product Name', ''),
                     'has_split': str(row.get('Split', '')).lower() == 'yes',
                     'acv_breakdown': {
-                        'software': self._parse_amount(row.get('ACV Sales (Software)', 0)),
-                        'managed_services': self._parse_amount(row.get('ACV Sales (Managed Services)', 0)),
-                        'professional_services': self._parse_amount(row.get('ACV Sales (Professional Services) ', 0)),
+                        'software': parse_amount(row.get('ACV Sales (Software)', 0)),
+                        'managed_services': parse_amount(row.get('ACV Sales (Managed Services)', 0)),
+                        'professional_services': parse_amount(row.get('ACV Sales (Professional Services) ', 0)),
                     },
-                    'tcv_professional_services': self._parse_amount(row.get('TCV (Professional Services)', 0)),
+                    'tcv_professional_services': parse_amount(row.get('TCV (Professional Services)', 0)),
                     'is_ps_deal': self._is_ps_deal(row),
                     'data_source': 'manual',
                     'transaction_type': transaction_type.value,
@@ -284,9 +430,9 @@ class SalesCookieParserV2:
                 
                 # Add withholding/forecast specific fields
                 if transaction.get('transaction_type') in ['withholding', 'forecast'] or transaction_type in [TransactionType.WITHHOLDING, TransactionType.FORECAST]:
-                    transaction['est_commission'] = self._parse_amount(row.get('Est. Commission', 0))
+                    transaction['est_commission'] = parse_amount(row.get('Est. Commission', 0))
                     transaction['est_commission_currency'] = row.get('Est. Commission Currency', 'EUR')
-                    transaction['est_commission_rate'] = self._parse_rate(row.get('Est. Commission Rate'))
+                    transaction['est_commission_rate'] = parse_rate(row.get('Est. Commission Rate'))
                     transaction['est_commission_details'] = row.get('Est. Commission Details', '')
                     
                     # Also check for withholding fields from combined file
@@ -303,9 +449,9 @@ class SalesCookieParserV2:
                         
                 # Add kicker fields for forecast transactions
                 if transaction.get('transaction_type') == 'forecast' or transaction_type == TransactionType.FORECAST:
-                    transaction['early_bird_kicker'] = self._parse_amount(row.get('Early Bird Kicker', 0))
-                    transaction['performance_kicker'] = self._parse_amount(row.get('Performance Kicker', 0))
-                    transaction['campaign_kicker'] = self._parse_amount(row.get('Campaign Kicker', 0))
+                    transaction['early_bird_kicker'] = parse_amount(row.get('Early Bird Kicker', 0))
+                    transaction['performance_kicker'] = parse_amount(row.get('Performance Kicker', 0))
+                    transaction['campaign_kicker'] = parse_amount(row.get('Campaign Kicker', 0))
                 
                 # Extract company info
                 transaction['company_id'], transaction['company_name'] = self._extract_customer_info(transaction['customer'])
@@ -386,14 +532,7 @@ class SalesCookieParserV2:
         """Extract company ID and name from customer field"""
         if pd.isna(customer_str):
             return '', ''
-            
-        customer_str = str(customer_str)
-        if ';' in customer_str:
-            parts = customer_str.split(';', 1)
-            if len(parts) == 2:
-                return parts[0].strip(), parts[1].strip()
-                
-        return '', customer_str.strip()
+        return _split_customer(customer_str)
         
     def _parse_date(self, date_str) -> Optional[datetime]:
         """Parse date string to datetime object"""
@@ -423,15 +562,12 @@ class SalesCookieParserV2:
         
     def _parse_amount(self, amount) -> float:
         """Parse amount to float"""
-        if pd.isna(amount) or amount == '' or amount is None:
-            return 0.0
+        return _parse_amount_value(amount)
             
-        try:
-            # Remove currency symbols and thousands separators
-            amount_str = str(amount).replace('€', '').replace('$', '').replace(',', '').strip()
-            return float(amount_str)
-        except:
-            return 0.0
+    def _parse_amounts(self, values: pd.Series) -> pd.Series:
+        """Column-wise _parse_amount (0.0 if missing or invalid)"""
+        cleaned = values.astype(str).str.replace(r'[€$,]', '', regex=True).str.strip()
+        return pd.to_numeric(cleaned, errors='coerce').fillna(0.0)
             
     def _parse_commission_amount(self, commission_str) -> float:
         """Parse commission from various formats"""
@@ -449,14 +585,14 @@ class SalesCookieParserV2:
         
     def _parse_rate(self, rate_str) -> float:
         """Parse commission rate percentage"""
-        if pd.isna(rate_str) or not rate_str:
+        if pd.isna(rate_str):
             return 0.0
+        return _parse_rate_value(rate_str)
             
-        try:
-            rate_clean = str(rate_str).replace('%', '').strip()
-            return float(rate_clean) / 100.0
-        except:
-            return 0.0
+    def _parse_rates(self, values: pd.Series) -> pd.Series:
+        """Column-wise _parse_rate (0.0 if missing or invalid)"""
+        cleaned = values.astype(str).str.replace('%', '', regex=False).str.strip()
+        return pd.to_numeric(cleaned, errors='coerce').fillna(0.0) / 100.0
             
     def _is_ps_deal(self, row) -> bool:
         """Determine if this is a Professional Services deal"""
@@ -469,6 +605,30 @@ class SalesCookieParserV2:
         
         return any(indicators)
         
+    def _is_ps_deals(self, df: pd.DataFrame) -> pd.Series:
+        """Column-wise _is_ps_deal for every row of df"""
+        def column(name):
+            if name in df.columns:
+                return df[name]
+            return pd.Series('', index=df.index, dtype=object)
+            
+        return (
+            column('Deal Name').fillna('').astype(str).str.upper().str.startswith('PS @') |
+            (column('Deal Type').fillna('').astype(str).str.lower() == 'professional services') |
+            (self._parse_rates(column('Commission Rate')) == 0.01) |  # 1% rate
+            (self._parse_amounts(column('TCV (Professional Services)')) > 0)
+        )
+        
+    def _extract_customer_infos(self, values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """Column-wise _extract_customer_info, returns (company ids, company names)"""
+        text = values.fillna('').astype(str)
+        parts = text.str.partition(';')
+        has_id = text.str.contains(';', regex=False)
+        
+        company_ids = parts[0].str.strip().where(has_id, '')
+        company_names = parts[2].str.strip().where(has_id, text.str.strip())
+        return company_ids, company_names
+        
     def generate_quality_report(self) -> str:
         """Generate a comprehensive data quality report"""
         report = ["=== SalesCookie Data Quality Report ===\n"]
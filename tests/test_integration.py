@@ -299,5 +299,50 @@ class TestIntegration(unittest.TestCase):
         import shutil
         shutil.rmtree(self.temp_dir)
 
+class TestFixIncreaseRevenueDates(unittest.TestCase):
+    """Tests for the fix_increase_revenue_dates script"""
+
+    def setUp(self):
+        """Set up a small credits export with a multi-line field and a blank line"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.temp_dir, 'credits.csv')
+        self.output_file = os.path.join(self.temp_dir, 'credits_fixed.csv')
+        with open(self.input_file, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(
+                'Deal Name,Close Date,Revenue Start Date,Commission\n'
+                '"Software License@Aktia Bank Abp\n(renewal)",2025-07-15 00:00:00,2025-08-01 00:00:00,3650\n'
+                'CPI Increase 2025@Kreditanstalt für Wiederaufbau,2025-07-28 00:00:00,2025-08-01 00:00:00,365\n'
+                '\n'
+                'FP Increase 2025@Tieto,2025-03-01 00:00:00,2025-04-01 00:00:00,100\n'
+                'CPI Increase 2024@State Bank of India,2024-11-20 00:00:00,2025-01-01 00:00:00,50\n'
+            )
+
+    def test_diff_only(self):
+        """Test that --diff-only logs the data rows of the fixes and writes no output CSV"""
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'fix_increase_revenue_dates.py')
+        cmd = [sys.executable, script, self.input_file, self.output_file, '--diff-only']
+
+        # The change log is written to the working directory
+        result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.temp_dir)
+
+        self.assertEqual(result.returncode, 0, f"Script failed: {result.stderr}")
+        self.assertFalse(os.path.exists(self.output_file))
+
+        change_log = pd.read_csv(os.path.join(self.temp_dir, 'revenue_date_fixes.csv'))
+        # Data rows count records, not lines: the multi-line first record is
+        # row 1 and the blank line before the Tieto deal is not counted
+        self.assertEqual(change_log['Data Row'].tolist(), [2, 3])
+        self.assertEqual(change_log['Deal'].tolist(), [
+            'CPI Increase 2025@Kreditanstalt für Wiederaufbau',
+            'FP Increase 2025@Tieto',
+        ])
+        self.assertEqual(change_log['New Revenue Start'].tolist(), ['2026-01-01', '2026-01-01'])
+
+    def tearDown(self):
+        """Clean up test files"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -7,6 +7,9 @@ import tempfile
 import os
 import sys
 from datetime import datetime
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 
 # Add parent directory to path
@@ -16,6 +19,7 @@ from hubspot_parser import HubSpotParser
 from salescookie_parser_v2 import SalesCookieParserV2, DataSource
 from reconciliation_engine_v2 import ReconciliationEngineV2
 from commission_config import CommissionConfig
+from reconcile_all_quarters import parse_sc_dates
 
 class TestReconciliation(unittest.TestCase):
     """Test suite for reconciliation components"""
@@ -137,7 +141,38 @@ class TestReconciliation(unittest.TestCase):
         self.assertEqual(quality.truncated_names, 0)
         self.assertEqual(transactions[0]['salescookie_id'], '270402053362')
         self.assertEqual(transactions[0]['commission_amount'], 3650)
-        
+
+    def assert_same_as_parse_file(self, parser, results, file_paths):
+        """Check parse_files results against serial parse_file calls, in order"""
+        self.assertEqual([path for path, _, _ in results], file_paths)
+        for (_, transactions, quality), file_path in zip(results, file_paths):
+            expected_transactions, expected_quality = parser.parse_file(file_path)
+            pd.testing.assert_frame_equal(pd.DataFrame(transactions), pd.DataFrame(expected_transactions))
+            self.assertEqual(quality, expected_quality)
+
+    def test_parse_files_matches_parse_file(self):
+        """Test that parallel parse_files returns what serial parse_file does"""
+        parser = SalesCookieParserV2()
+        file_paths = [self.manual_file, self.scraped_file, self.manual_file]
+
+        results = list(parser.parse_files(file_paths))
+
+        self.assert_same_as_parse_file(parser, results, file_paths)
+
+    def test_parse_files_broken_pool(self):
+        """Test that parse_files falls back to serial parsing if the pool breaks"""
+        class BrokenPool(ThreadPoolExecutor):
+            def submit(self, fn, *args, **kwargs):
+                raise BrokenProcessPool('worker died')
+
+        parser = SalesCookieParserV2()
+        file_paths = [self.manual_file, self.scraped_file]
+
+        with patch('salescookie_parser_v2.ProcessPoolExecutor', BrokenPool):
+            results = list(parser.parse_files(file_paths))
+
+        self.assert_same_as_parse_file(parser, results, file_paths)
+
     def test_salescookie_parser_scraped(self):
         """Test SalesCookie parser with scraped data"""
         parser = SalesCookieParserV2()
@@ -240,7 +275,40 @@ class TestEdgeCases(unittest.TestCase):
         quality = parser.assess_data_quality(bad_data, DataSource.SCRAPED)
         self.assertLess(quality.quality_score, 50)
         self.assertIn('Unique ID', quality.missing_fields)
-        
+
+    def test_combined_file_dates(self):
+        """Test that combined-file dates parse by separator, whatever their order"""
+        values = pd.Series(['05.03.2024', '03/05/2024', '2024-03-05', '12/31/2024', '31.12.2024', None],
+                           name='Close Date')
+        expected = [datetime(2024, 3, 5)] * 3 + [datetime(2024, 12, 31)] * 2 + [pd.NaT]
+
+        self.assertEqual(parse_sc_dates(values).tolist(), expected)
+        # Each cell parses the same way regardless of the other rows
+        reordered = values[::-1].reset_index(drop=True)
+        self.assertEqual(parse_sc_dates(reordered).tolist(), expected[::-1])
+        self.assertEqual(parse_sc_dates(values[values.str.contains('.', regex=False, na=False)]).tolist(),
+                         [datetime(2024, 3, 5), datetime(2024, 12, 31)])
+
+    def test_dotted_close_date(self):
+        """Test that dotted dates are parsed day-first"""
+        test_data = {
+            'Record ID': ['270402053367'],
+            'Deal Name': ['Software License@Dotted Date AG'],
+            'Deal Stage': ['Closed & Won'],
+            'Amount in company currency': [10000],
+            'Close Date': ['05.03.2024'],
+        }
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
+            pd.DataFrame(test_data).to_csv(f, index=False)
+            temp_file = f.name
+
+        try:
+            deals = HubSpotParser(temp_file).parse()
+            self.assertEqual(deals[0]['close_date'], datetime(2024, 3, 5))
+        finally:
+            os.unlink(temp_file)
+
     def test_currency_conversion(self):
         """Test currency handling"""
         # Create test data with SEK currency
@@ -272,5 +340,86 @@ class TestEdgeCases(unittest.TestCase):
         finally:
             os.unlink(temp_file)
 
+class TestHubSpotCache(unittest.TestCase):
+    """Test the on-disk cache of parsed HubSpot deals"""
+
+    def setUp(self):
+        """Write a small HubSpot export and an empty cache directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.hubspot_file = os.path.join(self.temp_dir, 'hubspot_test.csv')
+        self.write_export(['Software License@Aktia Bank Abp'])
+
+    def write_export(self, deal_names):
+        """Write an export with one Closed & Won deal per name"""
+        pd.DataFrame({
+            'Record ID': [str(270402053362 + i) for i in range(len(deal_names))],
+            'Deal Name': deal_names,
+            'Deal Stage': ['Closed & Won'] * len(deal_names),
+            'Amount in company currency': [50000] * len(deal_names),
+            'Close Date': ['2025-07-15'] * len(deal_names),
+        }).to_csv(self.hubspot_file, index=False)
+
+    def cache_files(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_cache_hit(self):
+        """Test that a second parse is served from the cache"""
+        first = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+        self.assertEqual(len(self.cache_files()), 1)
+
+        with patch('hubspot_parser.pd.read_csv', side_effect=AssertionError('CSV re-read')):
+            cached = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+
+        self.assertEqual([deal.hubspot_id for deal in cached], [deal.hubspot_id for deal in first])
+        self.assertEqual(cached[0].close_date, datetime(2025, 7, 15))
+
+    def test_cache_invalidated_on_change(self):
+        """Test that a changed export is re-parsed and its old cache removed"""
+        HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+        old_files = self.cache_files()
+
+        self.write_export(['Software License@Aktia Bank Abp', 'Managed Services@State Bank of India'])
+        deals = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+
+        self.assertEqual(len(deals), 2)
+        self.assertEqual(len(self.cache_files()), 1)
+        self.assertNotEqual(self.cache_files(), old_files)
+
+    def test_same_name_exports_keep_their_caches(self):
+        """Test that exports with the same file name in different directories do not evict each other"""
+        other_dir = os.path.join(self.temp_dir, 'other')
+        os.makedirs(other_dir)
+        other_file = os.path.join(other_dir, os.path.basename(self.hubspot_file))
+        pd.read_csv(self.hubspot_file).assign(**{'Deal Name': 'Managed Services@State Bank of India'}).to_csv(
+            other_file, index=False)
+
+        HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+        HubSpotParser(other_file, cache_dir=self.cache_dir).parse()
+        self.assertEqual(len(self.cache_files()), 2)
+
+        with patch('hubspot_parser.pd.read_csv', side_effect=AssertionError('CSV re-read')):
+            deals = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+        self.assertEqual(deals[0].deal_name, 'Software License@Aktia Bank Abp')
+
+    def test_corrupt_cache(self):
+        """Test that an unreadable cache file is ignored and rewritten"""
+        parser = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir)
+        parser.parse()
+        cache_path = parser._cache_path()
+        with open(cache_path, 'wb') as f:
+            f.write(b'not a pickle')
+
+        deals = HubSpotParser(self.hubspot_file, cache_dir=self.cache_dir).parse()
+
+        self.assertEqual(len(deals), 1)
+        self.assertEqual(deals[0].deal_name, 'Software License@Aktia Bank Abp')
+        self.assertEqual(len(parser._load_cache(cache_path)), 1)
+
+    def tearDown(self):
+        """Clean up test files"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file